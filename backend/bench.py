@@ -0,0 +1,592 @@
+"""
+Throughput benchmarks for the SDR pipeline stages.
+
+Pages are replayed from the scrape cache (or a folder of .md files), so only
+the stage under test talks to its real backend:
+
+    python bench.py gatekeeper --pages 20 --batch-size 5
+    python bench.py hunter --pages 10
+    python bench.py blacklist --urls 2000
+    python bench.py textproc --pages 200
+
+The validator check runs the social profile validator against fake profile
+hosts and fails if any live, dead or blocked profile gets the wrong verdict:
+
+    python bench.py validator --urls 300 --blocked-rate 0.1
+
+The resume check kills a campaign right after a qualified lead failed in
+the Hunter, resumes it, and fails unless that lead still holds its slot,
+as it would have in an uninterrupted run:
+
+    python bench.py resume --leads 5
+
+The pipeline benchmark runs whole campaigns offline against local fakes of
+Firecrawl, the search backend and both LLM servers (see fakes.py), and saves
+its numbers under bench_results/ so runs can be compared across commits:
+
+    python bench.py pipeline --leads 50 --concurrency 4 --llm-latency 0.5
+    python bench.py compare                  # newest two runs
+    python bench.py compare a.json b.json
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_results")
+
+
+def load_pages(source, limit):
+    """Returns [(name, markdown)] from a folder of .md files or from the scrape cache."""
+    if source and os.path.isdir(source):
+        pages = []
+        for path in sorted(glob.glob(os.path.join(source, "*.md")))[:limit]:
+            with open(path, "r", encoding="utf-8") as f:
+                pages.append((os.path.basename(path), f.read()))
+        return pages
+
+    from cache import DiskCache
+    from scout import SCRAPE_CACHE_FILE
+    cache = DiskCache(source or SCRAPE_CACHE_FILE)
+    return [(f"page-{i}", v["markdown"]) for i, v in enumerate(cache.values(limit)) if v.get("markdown")]
+
+
+def timed(fn, jobs, workers):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(fn, jobs))
+    return time.perf_counter() - started
+
+
+def report(label, leads, seconds):
+    print(f"{label:<28} {leads:>4} leads  {seconds:>7.1f}s  {leads / seconds * 60:>7.1f} leads/min")
+
+
+def bench_gatekeeper(args):
+    from scout import SDRScout
+
+    pages = load_pages(args.source, args.pages)
+    if not pages:
+        print("[!] No pages to replay. Run a campaign first or pass --source <dir of .md files>.")
+        return
+    scout = SDRScout()
+    items = [(name, markdown, name) for name, markdown in pages]
+
+    # Cache disabled on both paths, we are measuring the model
+    single = timed(lambda item: scout.analyze_business_model(item[1], item[2], use_cache=False), items, args.workers)
+    report("single (1 lead/request)", len(items), single)
+
+    chunks = [items[i:i + args.batch_size] for i in range(0, len(items), args.batch_size)]
+    batched = timed(lambda chunk: scout.analyze_business_models(chunk, use_cache=False), chunks, args.workers)
+    report(f"batched ({args.batch_size} leads/request)", len(items), batched)
+    print(f"Speedup: {single / batched:.2f}x")
+
+
+def load_sites(limit):
+    """Homepages from the scrape cache with the fields the Hunter needs."""
+    from cache import DiskCache
+    from condense import condense_markdown
+    from scout import SCRAPE_CACHE_FILE, HUNTER_TOKEN_BUDGET
+
+    sites = []
+    for i, page in enumerate(DiskCache(SCRAPE_CACHE_FILE).values(limit)):
+        if not page.get("markdown"):
+            continue
+        leadership_md, _ = condense_markdown(page["markdown"], HUNTER_TOKEN_BUDGET, focus="leadership")
+        first_line = page["markdown"].strip().splitlines()[0].strip("# ")[:60]
+        sites.append((first_line or f"Company {i}", leadership_md, page.get("socials", {})))
+    return sites
+
+
+def bench_hunter(args):
+    from identity import IdentityHunter
+
+    sites = load_sites(args.pages)
+    if not sites:
+        print("[!] No pages to replay. Run a campaign first so the scrape cache has data.")
+        return
+    hunter = IdentityHunter()
+
+    for label, single_pass in (("two-pass (before)", False), ("single-pass (after)", True)):
+        latencies = []
+        for company, context, socials in sites:
+            started = time.perf_counter()
+            hunter.find_decision_maker(company, context, socials, use_cache=False, single_pass=single_pass)
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"{label:<22} {len(latencies):>4} leads  mean {sum(latencies) / len(latencies):>6.2f}s  p50 {p50:>6.2f}s  p95 {p95:>6.2f}s")
+
+
+def bench_blacklist(args):
+    import random
+    import tempfile
+    from blacklist import BlacklistMatcher, DEFAULT_DOMAINS, DEFAULT_DOMAIN_KEYWORDS, DEFAULT_PATHS
+
+    rng = random.Random(7)
+    def fake_domain():
+        return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(10)) + rng.choice([".com", ".net", ".io"])
+
+    disagreements = 0
+    for size in args.sizes:
+        domains = DEFAULT_DOMAINS + [fake_domain() for _ in range(size)]
+        # Mostly unknown sites, some blacklisted hosts, some article paths
+        urls = []
+        for i in range(args.urls):
+            host = rng.choice(domains) if i % 5 == 0 else fake_domain()
+            urls.append(f"https://www.{host}" + (rng.choice(DEFAULT_PATHS) + "post" if i % 7 == 0 else "/"))
+
+        # Old approach: substring scan over the whole list for every URL
+        old_list = domains + DEFAULT_DOMAIN_KEYWORDS
+        started = time.perf_counter()
+        verdicts = []
+        for url in urls:
+            verdicts.append(any(b in urlparse(url).netloc for b in old_list) or any(p in url for p in DEFAULT_PATHS))
+        old = (time.perf_counter() - started) / len(urls)
+
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+            f.write("\n".join(domains[len(DEFAULT_DOMAINS):]))
+        started = time.perf_counter()
+        matcher = BlacklistMatcher(f.name)
+        load = time.perf_counter() - started
+        started = time.perf_counter()
+        blocked = [matcher.screen(url) is not None for url in urls]
+        new = (time.perf_counter() - started) / len(urls)
+        os.unlink(f.name)
+        wrong = sum(a != b for a, b in zip(blocked, verdicts))
+        disagreements += wrong
+
+        print(f"{size:>7} domains  substring scan {old * 1e6:>9.1f}us/url  matcher {new * 1e6:>6.2f}us/url  "
+              f"({old / new:>6.0f}x, load {load * 1000:.0f}ms)" + (f"  [!] {wrong} verdicts differ" if wrong else ""))
+    if disagreements:
+        sys.exit(1)
+
+
+def bench_textproc(args):
+    import asyncio
+    import textproc
+    from scout import GATEKEEPER_TOKEN_BUDGET, HUNTER_TOKEN_BUDGET
+
+    pages = [markdown for _, markdown in load_pages(args.source, args.pages)]
+    if not pages:
+        # No saved pages: generated ones, repeated up to a realistic size
+        from fakes import page_markdown
+        pages = [page_markdown(f"https://www.site{i}.com/") * args.scale for i in range(args.pages)]
+    chars = sum(len(p) for p in pages)
+    print(f"{len(pages)} pages, {chars / len(pages) / 1000:.0f}k chars on average")
+
+    started = time.process_time()
+    for page in pages:
+        textproc.analyze_page(page, "", GATEKEEPER_TOKEN_BUDGET, HUNTER_TOKEN_BUDGET)
+    print(f"analyze_page: {(time.process_time() - started) / len(pages) * 1000:.2f} ms CPU per page")
+
+    # What the event loop feels while a pipeline's worth of pages is analyzed
+    async def run(use_pool):
+        lags = []
+        done = asyncio.Event()
+
+        async def ticker():
+            while not done.is_set():
+                before = time.perf_counter()
+                await asyncio.sleep(0.005)
+                lags.append(time.perf_counter() - before - 0.005)
+
+        def work(page):
+            if use_pool:
+                return textproc.process_pool().submit(
+                    textproc.analyze_page, page, "", GATEKEEPER_TOKEN_BUDGET, HUNTER_TOKEN_BUDGET).result()
+            return textproc.analyze_page(page, "", GATEKEEPER_TOKEN_BUDGET, HUNTER_TOKEN_BUDGET)
+
+        tick = asyncio.create_task(ticker())
+        started = time.perf_counter()
+        sem = asyncio.Semaphore(args.workers)
+
+        async def one(page):
+            async with sem:
+                await asyncio.to_thread(work, page)
+        await asyncio.gather(*(one(page) for page in pages))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await tick
+        return elapsed, percentile(lags, 0.95), max(lags)
+
+    if textproc.TEXTPROC_WORKERS:
+        # Warm up the workers so spawn time isn't counted
+        list(textproc.process_pool().map(textproc.extract_socials, pages[:textproc.TEXTPROC_WORKERS * 2]))
+    for label, use_pool in (("threads (inline)", False), (f"process pool ({textproc.TEXTPROC_WORKERS})", True)):
+        if use_pool and not textproc.TEXTPROC_WORKERS:
+            continue
+        elapsed, p95, worst = asyncio.run(run(use_pool))
+        print(f"{label:<22} {len(pages) / elapsed:>7.1f} pages/s  loop lag p95 {p95 * 1000:>6.1f}ms  max {worst * 1000:>6.1f}ms")
+    textproc.shutdown()
+
+
+def bench_validator(args):
+    import asyncio
+    import httpx
+    from cache import DiskCache
+    from fakes import profile_outcome, profile_transport
+    from validator import SocialURLValidator
+
+    hosts = ("https://x.com/", "https://www.linkedin.com/in/", "https://github.com/")
+    urls = [f"{hosts[i % len(hosts)]}user{i}" for i in range(args.urls)]
+    expected = {url: profile_outcome(url, args.dead_rate, args.blocked_rate) for url in urls}
+    outcomes = {o: sum(1 for e in expected.values() if e == o) for o in ("alive", "dead", "blocked")}
+    print(f"{len(urls)} profiles: {outcomes['alive']} alive, {outcomes['dead']} dead, {outcomes['blocked']} blocked")
+
+    requests = []
+
+    async def run(scratch):
+        transport = profile_transport(args.dead_rate, args.blocked_rate, requests)
+        validator = SocialURLValidator(
+            client=httpx.AsyncClient(transport=transport),
+            cache=DiskCache(os.path.join(scratch, "validation_cache.db"), ttl=3600),
+        )
+        failures = 0
+        try:
+            # The second pass must answer live and dead profiles from the cache
+            # and only go back to the network for blocked ones
+            for label in ("cold", "cached"):
+                before = len(requests)
+                started = time.perf_counter()
+                kept = await validator.validate_many(urls)
+                elapsed = time.perf_counter() - started
+                # Dead profiles are dropped; live and blocked (can't tell) ones are kept
+                wrong = [url for url, k in zip(urls, kept) if (k == "") != (expected[url] == "dead")]
+                refetched = {url for _, url in requests[before:]}
+                if label == "cached":
+                    wrong += [url for url in refetched if expected[url] != "blocked"]
+                print(f"{label:<8} {elapsed:>6.2f}s  {len(requests) - before:>5} requests  {len(wrong)} wrong verdicts")
+                for url in wrong[:5]:
+                    print(f"    [!] {url} ({expected[url]})")
+                failures += len(wrong)
+        finally:
+            await validator.aclose()
+        return failures
+
+    with tempfile.TemporaryDirectory() as scratch:
+        failures = asyncio.run(run(scratch))
+    if failures:
+        sys.exit(1)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def point_at_fakes(backends, real_limits=False):
+    """
+    Points every backend at the fakes and every file at a scratch directory.
+    Modules read their settings at import time, so this has to run before
+    the first pipeline import.
+    """
+    scratch = tempfile.mkdtemp(prefix="sdr-bench-")
+    os.environ.update({
+        "FIRECRAWL_API_URL": backends.url, "FIRECRAWL_API_KEY": "fc-bench",
+        "OLLAMA_BASE_URL": backends.url + "/v1", "OLLAMA_API_KEY": "bench", "OLLAMA_MODEL": "fake",
+        "DEEPSEEK_BASE_URL": backends.url + "/v1", "DEEPSEEK_API_KEY": "bench",
+        "SEARCH_API_URL": backends.url + "/search",
+        "SDR_DB_FILE": os.path.join(scratch, "sdr_agent.db"),
+        "LLM_CACHE_FILE": os.path.join(scratch, "llm_cache.db"),
+        "SCRAPE_CACHE_FILE": os.path.join(scratch, "scrape_cache.db"),
+        "VALIDATION_CACHE_FILE": os.path.join(scratch, "validation_cache.db"),
+    })
+    if not real_limits:
+        for backend in ("DDGS", "FIRECRAWL", "OLLAMA", "DEEPSEEK"):
+            os.environ[f"RATE_LIMIT_{backend}"] = "1000/1000"
+    # No legacy campaign_results.json / history_db.json gets picked up from here
+    os.chdir(scratch)
+    return scratch
+
+
+def bench_pipeline(args):
+    import asyncio
+    import contextlib
+    import io
+    import resource
+    import tracemalloc
+    from fakes import FakeBackends
+
+    pages = None
+    if args.pages:
+        if os.path.isdir(args.pages):
+            pages = [markdown for _, markdown in load_pages(args.pages, 10000)]
+        else:
+            # Read the cache directly, importing scout now would freeze its settings
+            from cache import DiskCache
+            pages = [v["markdown"] for v in DiskCache(args.pages).values(10000) if v.get("markdown")]
+    backends = FakeBackends(llm_latency=args.llm_latency, llm_jitter=args.llm_jitter,
+                            llm_failure_rate=args.llm_failure_rate, scrape_latency=args.scrape_latency,
+                            search_latency=args.search_latency, pages=pages, seed=args.seed).start()
+
+    point_at_fakes(backends, args.real_limits)
+
+    import httpx
+    import metrics
+    from database import ResultsStore
+    from fakes import profile_transport
+    from jobs import JobManager
+    from scheduler import Scheduler, STAGE_CAPACITY
+
+    spans = {}
+    errors = {}
+
+    def on_metric(event):
+        spans.setdefault(event["stage"], []).append(event["seconds"])
+        if not event["ok"]:
+            errors[event["stage"]] = errors.get(event["stage"], 0) + 1
+
+    async def run():
+        scheduler = Scheduler(capacity={stage: args.concurrency for stage in STAGE_CAPACITY})
+        scheduler.agents["hunter"].validator.client = httpx.AsyncClient(transport=profile_transport())
+        manager = JobManager(ResultsStore(), scheduler=scheduler)
+        config = {"niche": args.niche, "count": args.leads, "gatekeeper_batch_size": args.batch_size}
+        job = manager.start(config)
+        await job.task
+        leads = await asyncio.to_thread(manager.store.leads, job.id)
+        await manager.shutdown()
+        return sum(1 for _, stage, _ in leads if stage == "done")
+
+    metrics.registry().subscribe(on_metric)
+    tracemalloc.start()
+    started = time.perf_counter()
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else output):
+            leads = asyncio.run(run())
+    finally:
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        metrics.registry().unsubscribe(on_metric)
+        backends.stop()
+
+    run_info = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": {k: v for k, v in vars(args).items() if k != "run"},
+        "elapsed_s": round(elapsed, 3),
+        "leads": leads,
+        "leads_per_min": round(leads / elapsed * 60, 2) if leads else 0.0,
+        "peak_traced_mb": round(peak / 1024 / 1024, 2),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+        "backend_calls": dict(backends.counts),
+        "stages": {
+            stage: {
+                "count": len(values),
+                "errors": errors.get(stage, 0),
+                "p50_s": round(percentile(values, 0.5), 4),
+                "p95_s": round(percentile(values, 0.95), 4),
+            }
+            for stage, values in sorted(spans.items())
+        },
+    }
+
+    print(f"{leads} leads in {elapsed:.1f}s  ->  {run_info['leads_per_min']:.1f} leads/min at concurrency {args.concurrency}")
+    print(f"peak memory: {run_info['peak_traced_mb']:.1f} MB traced, {run_info['max_rss_mb']:.1f} MB RSS")
+    print(f"backend calls: {run_info['backend_calls']}")
+    print(f"{'stage':<16} {'n':>5} {'err':>4} {'p50':>8} {'p95':>8}")
+    for stage, s in run_info["stages"].items():
+        print(f"{stage:<16} {s['count']:>5} {s['errors']:>4} {s['p50_s']:>7.3f}s {s['p95_s']:>7.3f}s")
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{run_info['revision']}.json")
+        with open(path, "w") as f:
+            json.dump(run_info, f, indent=2)
+        print(f"[+] Saved {path}")
+
+
+def bench_resume(args):
+    import asyncio
+    import contextlib
+    import io
+    from fakes import FakeBackends
+
+    backends = FakeBackends(llm_latency=args.llm_latency, seed=args.seed).start()
+    point_at_fakes(backends)
+
+    import httpx
+    from database import ResultsStore
+    from fakes import profile_transport
+    from jobs import JobManager, holds_slot
+    from scheduler import Scheduler
+
+    def manager():
+        scheduler = Scheduler()
+        scheduler.agents["hunter"].validator.client = httpx.AsyncClient(transport=profile_transport())
+        return JobManager(ResultsStore(), scheduler=scheduler)
+
+    async def run():
+        # The first lead past the Gatekeeper fails in the Hunter, so it holds a slot it never fills
+        first = manager()
+        hunter = first.scheduler.agents["hunter"]
+        find_decision_maker = hunter.find_decision_maker
+        calls = []
+
+        def failing_find_decision_maker(*a, **kw):
+            calls.append(a[0])
+            if len(calls) == 1:
+                raise RuntimeError("injected Hunter failure")
+            return find_decision_maker(*a, **kw)
+
+        hunter.find_decision_maker = failing_find_decision_maker
+        job = first.start({"niche": args.niche, "count": args.leads})
+
+        # Kill the process (as far as the campaign can tell) once that failure is on disk
+        while not job.task.done():
+            leads = await asyncio.to_thread(first.store.leads, job.id)
+            if any(stage == "failed" and holds_slot(stage, lead) for _, stage, lead in leads):
+                break
+            await asyncio.sleep(0.05)
+        killed = not job.task.done()
+        await first.shutdown()
+
+        second = manager()
+        campaign = second.store.get(job.id)
+        resumed = second.start(campaign["config"], campaign_id=job.id, resume=True)
+        await resumed.task
+        leads = await asyncio.to_thread(second.store.leads, job.id)
+        await second.shutdown()
+        return killed, leads
+
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else output):
+            killed, leads = asyncio.run(run())
+    finally:
+        backends.stop()
+
+    stages = [stage for _, stage, _ in leads]
+    slots = sum(1 for _, stage, lead in leads if holds_slot(stage, lead))
+    failed_after_claim = sum(1 for _, stage, lead in leads if stage == "failed" and holds_slot(stage, lead))
+    print(f"killed mid-run: {killed}  target {args.leads}  done {stages.count('done')}  "
+          f"failed after qualifying {failed_after_claim}  slots held {slots}")
+    # Same rule as an uninterrupted run: the failed lead keeps its slot and isn't replaced
+    problems = []
+    if not killed:
+        problems.append("the campaign finished before it could be killed")
+    if failed_after_claim != 1:
+        problems.append(f"expected 1 lead failed after qualifying, got {failed_after_claim}")
+    if slots != args.leads or stages.count("done") != args.leads - failed_after_claim:
+        problems.append(f"expected {args.leads} slots and {args.leads - 1} drafts")
+    for problem in problems:
+        print(f"[!] {problem}")
+    if problems:
+        sys.exit(1)
+
+
+def bench_compare(args):
+    paths = args.runs or sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")))[-2:]
+    if len(paths) != 2:
+        print("[!] Need two runs to compare. Run `python bench.py pipeline` twice or pass two result files.")
+        return
+    with open(paths[0]) as f:
+        before = json.load(f)
+    with open(paths[1]) as f:
+        after = json.load(f)
+
+    def row(label, a, b, unit="", lower_is_better=True):
+        change = (b - a) / a * 100 if a else 0.0
+        better = (change < 0) == lower_is_better if change else True
+        print(f"{label:<24} {a:>10.3f}{unit} {b:>10.3f}{unit} {change:>+8.1f}% {'' if better else ' (worse)'}")
+
+    print(f"before: {os.path.basename(paths[0])} ({before['revision']})")
+    print(f"after:  {os.path.basename(paths[1])} ({after['revision']})")
+    changed = {k: (before["params"].get(k), v) for k, v in after["params"].items() if before["params"].get(k) != v}
+    for name, (a, b) in sorted(changed.items()):
+        print(f"[!] --{name.replace('_', '-')} differs: {a} -> {b}")
+    row("leads/min", before["leads_per_min"], after["leads_per_min"], lower_is_better=False)
+    row("elapsed", before["elapsed_s"], after["elapsed_s"], "s")
+    row("peak traced MB", before["peak_traced_mb"], after["peak_traced_mb"])
+    for stage in sorted(set(before["stages"]) | set(after["stages"])):
+        a, b = before["stages"].get(stage), after["stages"].get(stage)
+        if a and b:
+            row(f"{stage} p50", a["p50_s"], b["p50_s"], "s")
+            row(f"{stage} p95", a["p95_s"], b["p95_s"], "s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gatekeeper = sub.add_parser("gatekeeper", help="Single vs batched Gatekeeper qualification")
+    gatekeeper.add_argument("--source", help="Folder of .md pages or a scrape cache file (default: the scrape cache)")
+    gatekeeper.add_argument("--pages", type=int, default=20)
+    gatekeeper.add_argument("--batch-size", type=int, default=5)
+    gatekeeper.add_argument("--workers", type=int, default=2, help="Parallel requests, like GATEKEEPER_WORKERS")
+    gatekeeper.set_defaults(run=bench_gatekeeper)
+
+    hunter = sub.add_parser("hunter", help="Per-lead Hunter latency, two-pass vs single-pass")
+    hunter.add_argument("--pages", type=int, default=10)
+    hunter.set_defaults(run=bench_hunter)
+
+    blacklist = sub.add_parser("blacklist", help="Per-URL screening cost as the blacklist grows")
+    blacklist.add_argument("--urls", type=int, default=2000)
+    blacklist.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    blacklist.set_defaults(run=bench_blacklist)
+
+    text = sub.add_parser("textproc", help="Per-page text analysis CPU, and event loop lag inline vs in the process pool")
+    text.add_argument("--source", help="Folder of .md pages or a scrape cache file (default: the scrape cache, else generated pages)")
+    text.add_argument("--pages", type=int, default=200)
+    text.add_argument("--scale", type=int, default=40, help="Times each generated page is repeated")
+    text.add_argument("--workers", type=int, default=4, help="Pages analyzed at once, like SCRAPE_WORKERS")
+    text.set_defaults(run=bench_textproc)
+
+    validator = sub.add_parser("validator", help="Social profile validation against fake hosts: live/dead/blocked verdicts and caching")
+    validator.add_argument("--urls", type=int, default=300)
+    validator.add_argument("--dead-rate", type=float, default=0.2)
+    validator.add_argument("--blocked-rate", type=float, default=0.1)
+    validator.set_defaults(run=bench_validator)
+
+    pipeline = sub.add_parser("pipeline", help="Whole campaigns against local fakes: leads/min, stage p50/p95, memory")
+    pipeline.add_argument("--leads", type=int, default=20, help="Campaign target (N)")
+    pipeline.add_argument("--concurrency", type=int, default=4, help="Worker slots per stage (C)")
+    pipeline.add_argument("--niche", default="Marketing Agencies in Austin")
+    pipeline.add_argument("--batch-size", type=int, default=1, help="Gatekeeper leads per request")
+    pipeline.add_argument("--pages", help="Folder of .md pages or a scrape cache file to serve instead of generated pages")
+    pipeline.add_argument("--llm-latency", type=float, default=0.2)
+    pipeline.add_argument("--llm-jitter", type=float, default=0.1)
+    pipeline.add_argument("--llm-failure-rate", type=float, default=0.0)
+    pipeline.add_argument("--scrape-latency", type=float, default=0.3)
+    pipeline.add_argument("--search-latency", type=float, default=0.4)
+    pipeline.add_argument("--seed", type=int, default=7)
+    pipeline.add_argument("--real-limits", action="store_true", help="Keep the production rate limits instead of lifting them")
+    pipeline.add_argument("--no-save", action="store_true")
+    pipeline.add_argument("--verbose", action="store_true", help="Show the agents' output")
+    pipeline.set_defaults(run=bench_pipeline)
+
+    resume = sub.add_parser("resume", help="Kill a campaign after a qualified lead failed, resume it, check the slots it holds")
+    resume.add_argument("--leads", type=int, default=5, help="Campaign target (N)")
+    resume.add_argument("--niche", default="Marketing Agencies in Austin")
+    resume.add_argument("--llm-latency", type=float, default=0.2)
+    resume.add_argument("--seed", type=int, default=7)
+    resume.add_argument("--verbose", action="store_true", help="Show the agents' output")
+    resume.set_defaults(run=bench_resume)
+
+    compare = sub.add_parser("compare", help="Diff two saved pipeline runs (default: the newest two)")
+    compare.add_argument("runs", nargs="*")
+    compare.set_defaults(run=bench_compare)
+
+    args = parser.parse_args()
+    args.run(args)
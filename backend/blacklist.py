@@ -0,0 +1,142 @@
+import os
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+# Extra entries, one per line (loaded on top of the defaults below, reloaded when the file changes):
+#   yelp.com          blocks any host containing it (notyelp.com and yelp.com.au too)
+#   keyword:wiki      the same, kept for readability
+#   path:/events/     substring of the URL
+#   # comment
+BLACKLIST_FILE = os.getenv("BLACKLIST_FILE", "blacklist.txt")
+# How often the file's mtime is checked, not once per URL
+RELOAD_INTERVAL = float(os.getenv("BLACKLIST_RELOAD_SECONDS", "5"))
+
+# Directories, social networks and content sites that are never leads
+DEFAULT_DOMAINS = [
+    'clutch.co', 'yelp.com', 'linkedin.com', 'facebook.com', 'instagram.com', 'twitter.com', 'glassdoor.com',
+    'upwork.com', 'expert.com', 'wikipedia.org', 'crunchbase.com', 'yellowpages.com', 'bbb.org', 'angis.com',
+    'houzz.com', 'thumbtack.com', 'expertise.com', 'upcity.com', 'designrush.com', 'goodfirms.co', 'sortlist.com',
+    'agencies.com', 'builtinaustin.com', 'nogood.io', 'writingstudio.com', 'medium.com', 'hubspot.com',
+    'wordpress.com', 'zhihu.com', 'quora.com', 'reddit.com', 'stackoverflow.com', 'youtube.com', 'vimeo.com',
+    'slideshare.net', 'issuu.com', 'zillow.com', 'realtor.com',
+]
+DEFAULT_DOMAIN_KEYWORDS = ['topagencies', 'bestagencies', 'directory', 'listing', 'review']
+# Listing pages of otherwise fine sites, matched anywhere in the URL
+DEFAULT_PATHS = ['/directory/', '/category/', '/tags/']
+# Listicle titles ("Top 10 agencies in ...")
+DEFAULT_TITLES = ['top ', 'best ', '10 ', '20 ', 'reviews']
+
+
+def _alternation(words):
+    """One compiled regex for a keyword list, or None if the list is empty."""
+    words = sorted(set(w for w in words if w), key=len, reverse=True)
+    return re.compile("|".join(map(re.escape, words))) if words else None
+
+
+class _Rules:
+    """Immutable compiled rule set, swapped in whole on reload."""
+    def __init__(self, domains, paths, titles):
+        self.domains = frozenset(d.lower().strip('.') for d in domains if d.strip('.'))
+        # Entry lengths, shortest first, so a host is probed once per (offset, length)
+        self.lengths = sorted({len(d) for d in self.domains})
+        self.paths = _alternation(p.lower() for p in paths)
+        self.titles = _alternation(t.lower() for t in titles)
+
+
+class BlacklistMatcher:
+    """
+    Screens search hits against the blacklist. An entry blocks every host that
+    contains it, as the old substring scan did, but entries go in a set and
+    each substring of the host is probed once per distinct entry length, so
+    the cost per URL stays flat as the list grows. The extra entries in `path`
+    are reloaded when the file's mtime changes.
+    """
+    def __init__(self, path=BLACKLIST_FILE, reload_interval=RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.lock = threading.Lock()
+        self.mtime = None
+        self.checked = 0.0
+        self.rules = self._load()
+
+    def _load(self):
+        domains, paths = DEFAULT_DOMAINS + DEFAULT_DOMAIN_KEYWORDS, list(DEFAULT_PATHS)
+        if self.path and os.path.exists(self.path):
+            self.mtime = os.path.getmtime(self.path)
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    entry = line.strip()
+                    if not entry or entry.startswith('#'):
+                        continue
+                    if entry.startswith('keyword:'):
+                        domains.append(entry[len('keyword:'):].strip())
+                    elif entry.startswith('path:'):
+                        paths.append(entry[len('path:'):].strip())
+                    else:
+                        domains.append(entry)
+            print(f"[*] Blacklist: loaded {len(domains)} domains from {self.path}")
+        else:
+            self.mtime = None
+        return _Rules(domains, paths, DEFAULT_TITLES)
+
+    def maybe_reload(self):
+        """Rebuilds the rules if the file appeared, changed or went away."""
+        now = time.monotonic()
+        if now - self.checked < self.reload_interval:
+            return
+        with self.lock:
+            if now - self.checked < self.reload_interval:
+                return
+            self.checked = now
+            try:
+                mtime = os.path.getmtime(self.path) if self.path and os.path.exists(self.path) else None
+            except OSError:
+                return
+            if mtime != self.mtime:
+                try:
+                    self.rules = self._load()
+                except Exception as e:
+                    print(f"[!] Blacklist reload failed, keeping the old rules: {e}")
+
+    def domain_blocked(self, host, rules=None):
+        """True if any entry occurs anywhere in the host."""
+        rules = rules or self.rules
+        host = host.lower().split(':')[0]
+        for start in range(len(host)):
+            for length in rules.lengths:
+                if start + length > len(host):
+                    break
+                if host[start:start + length] in rules.domains:
+                    return True
+        return False
+
+    def screen(self, url, title=""):
+        """Returns why a search hit is rejected ("domain", "path", "title") or None if it passes."""
+        self.maybe_reload()
+        rules = self.rules
+        url = url.lower()
+        if self.domain_blocked(urlparse(url).netloc, rules):
+            return "domain"
+        if rules.paths and rules.paths.search(url):
+            return "path"
+        if title and rules.titles and rules.titles.search(title.lower()):
+            return "title"
+        return None
+
+    def is_blacklisted(self, url):
+        return self.screen(url) is not None
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_blacklist():
+    """One matcher per process, so a big blacklist file is parsed once."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = BlacklistMatcher()
+        return _shared
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+from database import connect, transaction
+from metrics import registry
+
+# Query params that never change page content: any utm_* param, and these exact names
+TRACKING_PREFIXES = ('utm_',)
+TRACKING_PARAMS = frozenset({'gclid', 'fbclid', 'mc_cid', 'mc_eid', 'ref'})
+
+
+def _is_tracking(param):
+    param = param.lower()
+    return param in TRACKING_PARAMS or param.startswith(TRACKING_PREFIXES)
+
+
+def normalize_url(url):
+    """
+    Canonical form of a URL for cache keys: lowercase host without "www.",
+    no default port, fragment or tracking params, sorted query, no trailing slash.
+    """
+    parsed = urlparse(url.strip())
+    scheme = (parsed.scheme or "https").lower()
+    host = (parsed.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parsed.port and not ((scheme == "http" and parsed.port == 80) or (scheme == "https" and parsed.port == 443)):
+        host = f"{host}:{parsed.port}"
+    path = parsed.path.rstrip("/") or "/"
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if not _is_tracking(k)
+    ))
+    return urlunparse((scheme, host, path, "", query, ""))
+
+
+def content_key(*parts):
+    """Stable sha256 key for any JSON-serializable inputs."""
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    Persistent key/value cache on SQLite. Entries expire after `ttl` seconds and
+    the least recently used ones are evicted once the total size passes `max_bytes`.
+    """
+    def __init__(self, path, ttl=None, max_bytes=500 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.name = os.path.splitext(os.path.basename(path))[0]  # Metrics label, e.g. "scrape_cache"
+        self.conn = connect(path)
+        self.lock = threading.Lock()
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache_entries (accessed_at);
+        """)
+        self._bytes = self._total_bytes()
+
+        # Counters for this instance
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _total_bytes(self):
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+
+    def get(self, key):
+        """Returns the cached value, or None on a miss or an expired entry."""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT value, created_at FROM cache_entries WHERE key = ?", (key,)).fetchone()
+            if row and self.ttl is not None and now - row[1] > self.ttl:
+                self._drop(key)
+                row = None
+            if row is None:
+                self.misses += 1
+                registry().record_cache(self.name, hit=False)
+                return None
+            self.conn.execute("UPDATE cache_entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        registry().record_cache(self.name, hit=True)
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        data = json.dumps(value)
+        size = len(data.encode("utf-8"))
+        now = time.time()
+        with self.lock:
+            # A replaced entry's bytes leave the total
+            old = self.conn.execute("SELECT size FROM cache_entries WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, data, size, now, now)
+            )
+            self._bytes += size - (old[0] if old else 0)
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def delete(self, key):
+        with self.lock:
+            self._drop(key)
+
+    def _drop(self, key):
+        """Deletes one entry and takes its size off the total. Caller holds the lock."""
+        row = self.conn.execute("SELECT size FROM cache_entries WHERE key = ?", (key,)).fetchone()
+        if row:
+            self.conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+            self._bytes -= row[0]
+
+    def _evict(self):
+        """Drops least recently used entries until we are back under 90% of max_bytes."""
+        # Other processes write to the same file, so re-read the real total first
+        self._bytes = self._total_bytes()
+        if self._bytes <= self.max_bytes:
+            return
+        goal = self.max_bytes * 0.9
+        with transaction(self.conn):
+            rows = self.conn.execute("SELECT key, size FROM cache_entries ORDER BY accessed_at").fetchall()
+            doomed = []
+            for key, size in rows:
+                if self._bytes <= goal:
+                    break
+                doomed.append((key,))
+                self._bytes -= size
+            self.conn.executemany("DELETE FROM cache_entries WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    def values(self, limit=None):
+        """Most recently used values first. Used by the benchmarks to replay real data."""
+        sql = "SELECT value FROM cache_entries ORDER BY accessed_at DESC"
+        params = ()
+        if limit:
+            sql += " LIMIT ?"
+            params = (limit,)
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "bytes": self._bytes,
+        }
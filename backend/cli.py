@@ -0,0 +1,138 @@
+"""
+Headless batch runner: campaigns from a list of niches, without uvicorn or
+the frontend. Uses the same JobManager and Scheduler as the server, so
+results land in the results store as they are drafted and an interrupted
+batch can be picked up again with --resume.
+
+    python cli.py niches.txt --count 10 --max-active 2
+    python cli.py niches.txt --concurrency 4 --quiet >> batch.log
+    python cli.py --resume
+
+niches.txt has one niche per line, optionally followed by a comma or tab and
+its own target count; blank lines and # comments are skipped:
+
+    Marketing Agencies in Austin, 25
+    Dental Clinics in Denver
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import re
+import sys
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from database import ResultsStore
+from jobs import JobManager
+from scheduler import Scheduler, MAX_ACTIVE_CAMPAIGNS, STAGE_CAPACITY
+import metrics
+
+NICHE_LINE = re.compile(r'^(.*?)\s*[,\t]\s*(\d+)\s*$')
+
+
+def read_niches(path, default_count):
+    """[(niche, count)] from the niches file."""
+    niches = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            match = NICHE_LINE.match(line)
+            if match:
+                niches.append((match.group(1), int(match.group(2))))
+            else:
+                niches.append((line, default_count))
+    return niches
+
+
+async def run_batch(args, say):
+    capacity = {stage: args.concurrency for stage in STAGE_CAPACITY} if args.concurrency else None
+    manager = JobManager(ResultsStore(), scheduler=Scheduler(args.max_active, capacity))
+
+    campaigns = []
+    if args.resume:
+        for campaign in manager.store.unfinished():
+            say(f"[*] Resuming {campaign['niche']} ({campaign['id']})")
+            campaigns.append((campaign["niche"], manager.start(campaign["config"], campaign_id=campaign["id"], resume=True)))
+    for niche, count in read_niches(args.niches, args.count) if args.niches else []:
+        config = {"niche": niche, "count": count, "force_refresh": args.force_refresh}
+        if args.batch_size:
+            config["gatekeeper_batch_size"] = args.batch_size
+        campaigns.append((niche, manager.start(config)))
+    if not campaigns:
+        say("[!] Nothing to run. Pass a niches file or --resume.")
+        return 1
+
+    def follow(niche):
+        async def send(event):
+            if event["type"] == "result":
+                data = event["data"]
+                say(f"[+] {niche}: {data.get('company')} / {data.get('person')} <{data.get('website')}>")
+            elif event["type"] == "error":
+                say(f"[!] {niche}: {event['message']}")
+            elif event["type"] == "queue" and event["position"]:
+                say(f"[*] {niche}: queued (position {event['position']})")
+        return send
+
+    started = time.perf_counter()
+    for niche, job in campaigns:
+        await job.attach(follow(niche))
+    say(f"[*] Running {len(campaigns)} campaigns, {manager.scheduler.max_active} at a time")
+    try:
+        await asyncio.gather(*(job.task for _, job in campaigns), return_exceptions=True)
+    finally:
+        # On Ctrl+C unfinished campaigns stay 'running' and can be resumed
+        await manager.shutdown()
+    elapsed = time.perf_counter() - started
+
+    total = 0
+    failed = 0
+    say("")
+    say(f"{'campaign':<40} {'status':<8} {'drafts':>6}")
+    for niche, job in campaigns:
+        campaign = await asyncio.to_thread(manager.store.get, job.id)
+        leads = await asyncio.to_thread(manager.store.leads, job.id)
+        drafts = sum(1 for _, stage, _ in leads if stage == "done")
+        total += drafts
+        failed += campaign["status"] == "failed"
+        say(f"{niche[:40]:<40} {campaign['status']:<8} {drafts:>6}")
+
+    registry = metrics.registry()
+    tokens, saved = registry.total("sdr_llm_tokens_total"), registry.total("sdr_llm_tokens_saved_total")
+    say(f"\n{total} drafts in {elapsed / 60:.1f} min -> {total / elapsed * 60:.1f} leads/min")
+    say(f"LLM: {tokens:.0f} tokens used, {saved:.0f} served from cache, ${registry.total('sdr_llm_cost_usd_total'):.4f}")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("niches", nargs="?", help="File with one niche per line (optionally 'niche, count')")
+    parser.add_argument("--count", type=int, default=10, help="Target drafts for niches without their own count")
+    parser.add_argument("--max-active", type=int, default=MAX_ACTIVE_CAMPAIGNS, help="Campaigns running at the same time")
+    parser.add_argument("--concurrency", type=int, help="Worker slots per stage (default: the *_WORKERS settings)")
+    parser.add_argument("--batch-size", type=int, help="Gatekeeper leads per LLM request")
+    parser.add_argument("--force-refresh", action="store_true", help="Re-scrape sites even if cached")
+    parser.add_argument("--resume", action="store_true", help="Also continue campaigns an earlier run left unfinished")
+    parser.add_argument("--quiet", action="store_true", help="Only print results and the summary, not the agents' output")
+    args = parser.parse_args()
+
+    out = sys.stdout
+
+    def say(line):
+        print(line, file=out, flush=True)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull if args.quiet else out):
+        try:
+            return asyncio.run(run_batch(args, say))
+        except KeyboardInterrupt:
+            say("[!] Interrupted. Run with --resume to continue the unfinished campaigns.")
+            return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
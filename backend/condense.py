@@ -0,0 +1,135 @@
+import re
+
+# Rough chars-per-token for English markdown
+CHARS_PER_TOKEN = 4
+
+IMAGE = re.compile(r'!\[[^\]]*\]\([^)]*\)')
+LINK = re.compile(r'\[([^\]]*)\]\(([^)]*)\)')
+HEADING = re.compile(r'^\s{0,3}#{1,6}\s+(.*)$')
+# Links worth keeping verbatim, the Hunter needs profile URLs
+PROFILE_LINK = re.compile(r'(linkedin\.com|twitter\.com|x\.com)/', re.IGNORECASE)
+WHITESPACE = re.compile(r'\s+')
+
+BOILERPLATE = [
+    'cookie', 'accept all', 'privacy policy', 'terms of service', 'terms & conditions', 'terms and conditions',
+    'all rights reserved', '©', 'skip to content', 'skip to main', 'toggle navigation', 'powered by',
+]
+# One scan per line instead of one per phrase
+BOILERPLATE_RE = re.compile("|".join(re.escape(b) for b in BOILERPLATE))
+
+FOCUS_KEYWORDS = {
+    # Gatekeeper: what the business does and where the manual work is
+    "business": [
+        'services', 'what we do', 'solutions', 'about', 'contact', 'get in touch', 'book', 'schedule',
+        'appointment', 'consultation', 'careers', 'hiring', 'join', 'clients', 'portal', 'pricing', 'process',
+    ],
+    # Hunter: who runs the company
+    "leadership": [
+        'founder', 'co-founder', 'ceo', 'owner', 'president', 'managing director', 'principal', 'partner',
+        'leadership', 'our team', 'meet', 'about', 'who we are', 'staff', 'director',
+    ],
+}
+
+
+def _clean_line(line):
+    """Strips images and link markup from a line. Returns '' for nav/link-list lines."""
+    # Most lines are plain text, skip the link regexes for them
+    if '](' in line:
+        if '![' in line:
+            line = IMAGE.sub('', line)
+        links = LINK.findall(line)
+        if links:
+            # A line that is nothing but links (menus, footers, tag clouds) carries no content
+            plain = LINK.sub('', line).strip(' -*|•·>\t')
+            if len(plain) < 3 and not PROFILE_LINK.search(line):
+                return ''
+            line = LINK.sub(lambda m: m.group(0) if PROFILE_LINK.search(m.group(2)) else m.group(1), line)
+    stripped = line.strip()
+    if len(stripped) < 300 and BOILERPLATE_RE.search(stripped.lower()):
+        return ''
+    return stripped
+
+
+def split_sections(markdown):
+    """Splits markdown into (heading, body) sections, in page order."""
+    sections = []
+    heading, body = "", []
+    for raw in markdown.splitlines():
+        match = HEADING.match(raw)
+        if match:
+            if heading or body:
+                sections.append((heading, body))
+            heading, body = _clean_line(match.group(1)), []
+            continue
+        line = _clean_line(raw)
+        if line:
+            body.append(line)
+    if heading or body:
+        sections.append((heading, body))
+    return sections
+
+
+def join_sections(first, second):
+    """Sections of two pages as if their markdown had been joined with a newline."""
+    if first and second and not second[0][0]:
+        # Text before the second page's first heading continues the first page's last section
+        heading, body = first[-1]
+        return first[:-1] + [(heading, body + second[0][1])] + second[1:]
+    return first + second
+
+
+def condense_markdown(markdown, budget_tokens, focus="business"):
+    """
+    Shrinks scraped markdown to fit a token budget while keeping the parts the
+    LLM needs: drops images, menus, link lists and cookie/legal boilerplate,
+    removes repeated blocks, then keeps the sections that score highest for
+    `focus` (in page order). Returns (text, stats).
+    """
+    markdown = markdown or ""
+    return condense_sections(split_sections(markdown), len(markdown), budget_tokens, focus)
+
+
+def condense_sections(sections, original, budget_tokens, focus="business"):
+    """condense_markdown() for pages already split by split_sections(), so one parse can serve several budgets."""
+    budget = budget_tokens * CHARS_PER_TOKEN
+    keywords = FOCUS_KEYWORDS.get(focus, [])
+
+    seen = set()
+    candidates = []
+    for index, (heading, body) in enumerate(sections):
+        # Drop blocks we've already kept (headers/footers repeated across main + about pages)
+        lines = []
+        for line in body:
+            normalized = WHITESPACE.sub(' ', line.lower())
+            if normalized not in seen:
+                seen.add(normalized)
+                lines.append(line)
+        if not lines:
+            continue
+
+        text = (f"## {heading}\n" if heading else "") + "\n".join(lines)
+        heading_lower, body_lower = heading.lower(), text.lower()
+        score = sum(3 for k in keywords if k in heading_lower) + sum(1 for k in keywords if k in body_lower)
+        # The opening section names the company, keep it competitive
+        if index == 0:
+            score += 2
+        candidates.append((index, score, text))
+
+    chosen, used = [], 0
+    for index, score, text in sorted(candidates, key=lambda c: (-c[1], c[0])):
+        if used >= budget:
+            break
+        room = budget - used
+        if len(text) > room:
+            if room < 200:
+                continue
+            text = text[:room]
+        chosen.append((index, text))
+        used += len(text) + 2
+
+    condensed = "\n\n".join(text for _, text in sorted(chosen))
+    return condensed, {
+        "original_chars": original,
+        "condensed_chars": len(condensed),
+        "ratio": round(len(condensed) / original, 3) if original else 1.0,
+    }
@@ -1,42 +1,514 @@
 import json
 import os
-from urllib.parse import urlparse
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from domains import registrable_domain
+
+DB_FILE = os.getenv("SDR_DB_FILE", "sdr_agent.db")
+LEGACY_DB_FILE = "history_db.json"  # Old flat list of domains, migrated on first open
+LEGACY_RESULTS_FILE = "campaign_results.json"  # Old JSON array of results, imported on first open
+
+# SQLite caps the number of bound parameters per statement
+BATCH_SIZE = 500
+
+
+def connect(path=DB_FILE):
+    """
+    Opens the shared SQLite file. WAL lets readers run while another
+    connection (or process) is writing; busy_timeout makes writers queue up instead of failing.
+    """
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+
+@contextmanager
+def transaction(conn):
+    """BEGIN IMMEDIATE takes the write lock up front, so concurrent writers wait instead of deadlocking."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except:
+        conn.execute("ROLLBACK")
+        raise
+
+
+class DomainIndex:
+    """
+    Maps any URL to the canonical domain of the company behind it: its
+    registrable domain, followed through the redirect aliases we have seen
+    (old-brand.com -> new-brand.com). Aliases are shared by every process
+    using the database.
+    """
+    def __init__(self, path=DB_FILE):
+        self.conn = connect(path)
+        self.lock = threading.Lock()
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS domain_aliases (
+                alias TEXT PRIMARY KEY,
+                domain TEXT NOT NULL,
+                added_at REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+
+    def canonical(self, url):
+        return self.canonical_many([url]).get(url, "")
+
+    def canonical_many(self, urls):
+        """Returns {url: canonical domain} for every url that has a host, with one aliases lookup per batch."""
+        registrable = {url: registrable_domain(url) for url in urls}
+        domains = list({d for d in registrable.values() if d})
+        aliases = {}
+        with self.lock:
+            for i in range(0, len(domains), BATCH_SIZE):
+                chunk = domains[i:i + BATCH_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                aliases.update(self.conn.execute(
+                    f"SELECT alias, domain FROM domain_aliases WHERE alias IN ({placeholders})", chunk
+                ).fetchall())
+        return {url: aliases.get(d, d) for url, d in registrable.items() if d}
+
+    def add_alias(self, url, final_url):
+        """
+        Records that `url` redirected to `final_url`. Returns the canonical
+        domain of the pair, or "" if either has no host.
+        """
+        source, target = registrable_domain(url), registrable_domain(final_url)
+        if not source or not target:
+            return ""
+        target = self.canonical(target)
+        if source != target:
+            with self.lock, transaction(self.conn):
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO domain_aliases (alias, domain, added_at) VALUES (?, ?, ?)",
+                    (source, target, time.time())
+                )
+                # Keep every alias one hop from its final domain
+                self.conn.execute("UPDATE domain_aliases SET domain = ? WHERE domain = ?", (target, source))
+        return target
 
-DB_FILE = "history_db.json"
 
 class HistoryDB:
-    def __init__(self):
-        self.processed_domains = self._load_db()
+    def __init__(self, path=DB_FILE):
+        self.conn = connect(path)
+        # One connection per instance, shared by the pipeline's worker threads
+        self.lock = threading.Lock()
+        self.domains = DomainIndex(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS processed_domains (
+                domain TEXT PRIMARY KEY,
+                added_at REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        self._migrate_legacy_json()
+        self._canonicalize_domains()
 
-    def _load_db(self):
-        if not os.path.exists(DB_FILE):
-            return []
+    def _migrate_legacy_json(self):
+        """One-time import of history_db.json. The file is renamed afterwards so it only runs once."""
+        if not os.path.exists(LEGACY_DB_FILE):
+            return
         try:
-            with open(DB_FILE, 'r') as f:
+            with open(LEGACY_DB_FILE, 'r') as f:
                 data = json.load(f)
-                # Ensure we return a list
-                return data if isinstance(data, list) else []
-        except:
-            return []
+            domains = [d for d in data if isinstance(d, str) and d] if isinstance(data, list) else []
+            self._insert_domains([registrable_domain(d) for d in domains])
+            os.replace(LEGACY_DB_FILE, LEGACY_DB_FILE + ".migrated")
+            print(f"[+] HistoryDB: Migrated {len(domains)} domains from {LEGACY_DB_FILE}")
+        except FileNotFoundError:
+            pass  # Another instance migrated it first
+        except Exception as e:
+            print(f"[!] HistoryDB: Could not migrate {LEGACY_DB_FILE}: {e}")
 
-    def _get_domain(self, url):
-        try:
-            return urlparse(url).netloc.replace("www.", "").lower()
-        except:
-            return ""
+    def _canonicalize_domains(self):
+        """
+        One-time rewrite of rows stored before domains were canonical (they were
+        the host minus "www.", so blog.acme.com and acme.com were separate entries).
+        """
+        with self.lock:
+            done = self.conn.execute("SELECT 1 FROM meta WHERE key = 'history_domains_canonical'").fetchone()
+        if done:
+            return
+        with self.lock, transaction(self.conn):
+            if self.conn.execute("SELECT 1 FROM meta WHERE key = 'history_domains_canonical'").fetchone():
+                return
+            rows = self.conn.execute("SELECT domain, added_at FROM processed_domains").fetchall()
+            canonical = ((d, registrable_domain(d), added_at) for d, added_at in rows)
+            rekeyed = [(old, new, added_at) for old, new, added_at in canonical if new != old]
+            self.conn.executemany("INSERT OR IGNORE INTO processed_domains (domain, added_at) VALUES (?, ?)",
+                                  [(new, added_at) for _, new, added_at in rekeyed if new])
+            self.conn.executemany("DELETE FROM processed_domains WHERE domain = ?", [(old,) for old, _, _ in rekeyed])
+            self.conn.execute("INSERT INTO meta (key, value) VALUES ('history_domains_canonical', '1')")
+            if rekeyed:
+                print(f"[+] HistoryDB: Re-keyed {len(rekeyed)} domains to their registrable domain")
 
     def exists(self, url):
-        """Checks if a domain has already been processed."""
-        domain = self._get_domain(url)
-        return domain in self.processed_domains
+        """Checks if the company behind `url` has already been processed."""
+        return bool(self.exists_many([url]))
+
+    def exists_many(self, urls):
+        """Returns the subset of `urls` whose company has already been processed."""
+        canonical = self.domains.canonical_many(urls)
+        known = self.known_domains(canonical.values())
+        return {url for url, domain in canonical.items() if domain in known}
+
+    def known_domains(self, domains):
+        """Returns the subset of canonical `domains` already in the history."""
+        known = set()
+        domains = list(set(domains))
+        with self.lock:
+            for i in range(0, len(domains), BATCH_SIZE):
+                chunk = domains[i:i + BATCH_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT domain FROM processed_domains WHERE domain IN ({placeholders})", chunk
+                ).fetchall()
+                known.update(row[0] for row in rows)
+        return known
 
     def add(self, url):
         """Adds a url to the history."""
-        domain = self._get_domain(url)
-        if domain and domain not in self.processed_domains:
-            self.processed_domains.append(domain)
-            self._save()
-
-    def _save(self):
-        with open(DB_FILE, 'w') as f:
-            json.dump(self.processed_domains, f, indent=2)
\ No newline at end of file
+        self.add_many([url])
+
+    def add_many(self, urls):
+        """Adds several urls in one transaction."""
+        self._insert_domains(list(self.domains.canonical_many(urls).values()))
+
+    def _insert_domains(self, domains):
+        now = time.time()
+        rows = [(d, now) for d in dict.fromkeys(domains) if d]
+        if not rows:
+            return
+        with self.lock, transaction(self.conn):
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO processed_domains (domain, added_at) VALUES (?, ?)", rows
+            )
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM processed_domains").fetchone()[0]
+
+
+# Keys used by the first version of campaign_results.json
+LEGACY_RESULT_KEYS = {
+    "Company": "company",
+    "Decision Maker": "person",
+    "Website": "website",
+    "X Profile": "x_url",
+    "LinkedIn": "linkedin_url",
+    "Email Subject": "email_subject",
+    "Email Body": "email_body",
+    "Hypothesis": "hypothesis",
+    "Pain Points": "pain_points",
+}
+
+
+def normalize_result(record):
+    """Maps legacy result keys onto the current payload shape."""
+    result = {LEGACY_RESULT_KEYS.get(k, k): v for k, v in record.items()}
+    if isinstance(result.get("pain_points"), str):
+        result["pain_points"] = [result["pain_points"]]
+    return result
+
+
+class ResultsStore:
+    """
+    Append-only log of campaign results. Every result is a single-row insert
+    (its own transaction), so concurrent campaigns never overwrite each other.
+    """
+    def __init__(self, path=DB_FILE):
+        self.conn = connect(path)
+        self.lock = threading.Lock()
+        self.domains = DomainIndex(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS campaign_results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at REAL NOT NULL,
+                company TEXT,
+                person TEXT,
+                website TEXT,
+                linkedin_url TEXT,
+                data TEXT NOT NULL,
+                domain TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_results_created ON campaign_results (created_at);
+            -- The company filter is a substring match no index can serve
+            DROP INDEX IF EXISTS idx_results_company;
+            CREATE INDEX IF NOT EXISTS idx_results_website ON campaign_results (website);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        self._add_domain_column()
+        self._import_legacy_json()
+
+    def _add_domain_column(self):
+        """Databases from before results were keyed by company domain get the column and a backfill."""
+        with self.lock:
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(campaign_results)")]
+            if "domain" not in columns:
+                try:
+                    self.conn.execute("ALTER TABLE campaign_results ADD COLUMN domain TEXT")
+                except sqlite3.OperationalError:
+                    pass  # Another process added it first
+            missing = self.conn.execute(
+                "SELECT id, website FROM campaign_results WHERE domain IS NULL AND website IS NOT NULL"
+            ).fetchall()
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_results_domain ON campaign_results (domain)")
+        if missing:
+            canonical = self.domains.canonical_many([website for _, website in missing])
+            with self.lock, transaction(self.conn):
+                self.conn.executemany("UPDATE campaign_results SET domain = ? WHERE id = ?",
+                                      [(canonical.get(website), result_id) for result_id, website in missing])
+
+    def _import_legacy_json(self):
+        """One-time import of campaign_results.json, tracked in the meta table."""
+        if not os.path.exists(LEGACY_RESULTS_FILE):
+            return
+        with self.lock:
+            done = self.conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_results_imported'").fetchone()
+        if done:
+            return
+        try:
+            count = self.import_json(LEGACY_RESULTS_FILE, mark_imported=True)
+            print(f"[+] ResultsStore: Imported {count} results from {LEGACY_RESULTS_FILE}")
+        except Exception as e:
+            print(f"[!] ResultsStore: Could not import {LEGACY_RESULTS_FILE}: {e}")
+
+    def import_json(self, path, mark_imported=False):
+        """Imports a JSON array of results in one transaction. Returns the number of records added."""
+        with open(path, 'r') as f:
+            data = json.load(f)
+        records = [normalize_result(r) for r in data if isinstance(r, dict)] if isinstance(data, list) else []
+
+        with self.lock, transaction(self.conn):
+            # Re-check inside the write lock so two processes can't both import
+            if mark_imported:
+                if self.conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_results_imported'").fetchone():
+                    return 0
+                self.conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_results_imported', ?)", (path,))
+            now = time.time()
+            self.conn.executemany(
+                "INSERT INTO campaign_results (created_at, company, person, website, linkedin_url, data, domain) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [self._row(r, now) for r in records]
+            )
+        return len(records)
+
+    def _row(self, record, created_at):
+        return (
+            created_at,
+            record.get("company"),
+            record.get("person"),
+            record.get("website"),
+            record.get("linkedin_url") or None,
+            json.dumps(record),
+            self.domains.canonical(record.get("website") or "") or None,
+        )
+
+    def append(self, record):
+        """Stores one result and returns its id."""
+        with self.lock:
+            cursor = self.conn.execute(
+                "INSERT INTO campaign_results (created_at, company, person, website, linkedin_url, data, domain) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                self._row(record, time.time())
+            )
+        return cursor.lastrowid
+
+    def get(self, result_id):
+        with self.lock:
+            row = self.conn.execute("SELECT id, data FROM campaign_results WHERE id = ?", (result_id,)).fetchone()
+        return {**json.loads(row[1]), "id": row[0]} if row else None
+
+    def query(self, cursor=None, limit=50, company=None, domain=None, since=None, until=None,
+              has_person=None, has_linkedin=None, view="summary"):
+        """
+        One page of results, newest first. `cursor` is the id of the last row of
+        the previous page. Returns (items, next_cursor); next_cursor is None on the last page.
+        """
+        where, params = [], []
+        if cursor is not None:
+            where.append("id < ?")
+            params.append(cursor)
+        if company:
+            where.append("company LIKE ?")
+            params.append(f"%{company}%")
+        if domain:
+            # Any URL or host of the company works, e.g. www.acme.com/contact
+            where.append("domain = ?")
+            params.append(self.domains.canonical(domain) or domain)
+        if since is not None:
+            where.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("created_at < ?")
+            params.append(until)
+        if has_person is not None:
+            known = "(person IS NOT NULL AND person != '' AND person != 'Unknown')"
+            where.append(known if has_person else f"NOT {known}")
+        if has_linkedin is not None:
+            where.append("linkedin_url IS NOT NULL" if has_linkedin else "linkedin_url IS NULL")
+
+        # The summary view is served from indexed columns without parsing the JSON blob
+        columns = "id, created_at, company, person, website, linkedin_url" if view == "summary" else "id, created_at, data"
+        sql = f"SELECT {columns} FROM campaign_results"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit + 1)  # One extra row tells us whether another page exists
+
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if view == "summary":
+            items = [
+                {"id": r[0], "created_at": r[1], "company": r[2], "person": r[3], "website": r[4], "has_linkedin": r[5] is not None}
+                for r in rows
+            ]
+        else:
+            items = [{**json.loads(r[2]), "id": r[0], "created_at": r[1]} for r in rows]
+        return items, (items[-1]["id"] if has_more else None)
+
+    def iter_query(self, page_size=500, **filters):
+        """Yields every matching result page by page, for streaming exports."""
+        cursor = None
+        while True:
+            items, cursor = self.query(cursor=cursor, limit=page_size, **filters)
+            yield from items
+            if cursor is None:
+                return
+
+    def compact(self):
+        """
+        Drops older duplicates of the same company domain (keeping the newest
+        draft) and reclaims the freed pages. Returns the number of rows removed.
+        """
+        with self.lock:
+            with transaction(self.conn):
+                removed = self.conn.execute("""
+                    DELETE FROM campaign_results
+                    WHERE domain IS NOT NULL AND id NOT IN (
+                        SELECT MAX(id) FROM campaign_results WHERE domain IS NOT NULL GROUP BY domain
+                    )
+                """).rowcount
+            self.conn.execute("VACUUM")
+        return removed
+
+
+# Lead stages a campaign checkpoints, in pipeline order. The last three are terminal.
+LEAD_STAGES = ("discovered", "scraped", "qualified", "hunted", "done", "rejected", "failed")
+TERMINAL_STAGES = ("done", "rejected", "failed")
+
+
+class CampaignStore:
+    """
+    Campaigns and the last completed stage of each of their leads, so a
+    campaign can be picked up again after a restart without redoing work.
+    """
+    def __init__(self, path=DB_FILE):
+        self.conn = connect(path)
+        self.lock = threading.Lock()
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS campaigns (
+                id TEXT PRIMARY KEY,
+                niche TEXT,
+                target_count INTEGER,
+                config TEXT NOT NULL,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_campaigns_status ON campaigns (status);
+            CREATE TABLE IF NOT EXISTS lead_checkpoints (
+                campaign_id TEXT NOT NULL,
+                url TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (campaign_id, url)
+            ) WITHOUT ROWID;
+        """)
+
+    def create(self, campaign_id, config):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO campaigns (id, niche, target_count, config, status, created_at, updated_at) VALUES (?, ?, ?, ?, 'running', ?, ?)",
+                (campaign_id, config.get("niche"), int(config.get("count", 1)), json.dumps(config), now, now)
+            )
+
+    def set_status(self, campaign_id, status):
+        with self.lock:
+            self.conn.execute("UPDATE campaigns SET status = ?, updated_at = ? WHERE id = ?", (status, time.time(), campaign_id))
+
+    def get(self, campaign_id):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT id, niche, target_count, config, status, created_at, updated_at FROM campaigns WHERE id = ?", (campaign_id,)
+            ).fetchone()
+        return self._campaign(row) if row else None
+
+    def recent(self, limit=20):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, niche, target_count, config, status, created_at, updated_at FROM campaigns ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._campaign(r) for r in rows]
+
+    def unfinished(self):
+        """Campaigns that were still running when the process stopped, oldest first."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, niche, target_count, config, status, created_at, updated_at FROM campaigns WHERE status = 'running' ORDER BY created_at"
+            ).fetchall()
+        return [self._campaign(r) for r in rows]
+
+    def _campaign(self, row):
+        return {
+            "id": row[0], "niche": row[1], "target_count": row[2], "config": json.loads(row[3]),
+            "status": row[4], "created_at": row[5], "updated_at": row[6],
+        }
+
+    def checkpoint(self, campaign_id, url, stage, data):
+        """Records that `url` completed `stage`, with everything needed to continue from there."""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO lead_checkpoints (campaign_id, url, stage, data, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (campaign_id, url, stage, json.dumps(data), time.time())
+            )
+
+    def leads(self, campaign_id):
+        """Returns [(url, stage, data)] for every lead the campaign has seen."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT url, stage, data FROM lead_checkpoints WHERE campaign_id = ? ORDER BY updated_at", (campaign_id,)
+            ).fetchall()
+        return [(url, stage, json.loads(data)) for url, stage, data in rows]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintenance for the SDR agent results store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("compact", help="Drop duplicate drafts per company domain and vacuum the database")
+    import_cmd = sub.add_parser("import", help="Import a JSON array of results (e.g. an old campaign_results.json)")
+    import_cmd.add_argument("path")
+    args = parser.parse_args()
+
+    store = ResultsStore()
+    if args.command == "compact":
+        print(f"[+] Removed {store.compact()} duplicate results.")
+    else:
+        print(f"[+] Imported {store.import_json(args.path)} results.")
@@ -1,103 +1,148 @@
+import asyncio
 import os
+import re
 import time
-from duckduckgo_search import DDGS
-from urllib.parse import urlparse
+from blacklist import shared_blacklist
 from database import HistoryDB
+import metrics
+from ratelimit import run_blocking
+from search import web_search
+
+# Result counts per query for each discovery round. DDGS has no offset, so a
+# bigger round re-reads the first pages; dedupe drops what we already yielded.
+DISCOVERY_PAGE_SIZES = [int(n) for n in os.getenv("DISCOVERY_PAGE_SIZES", "20,50,100").split(",")]
+DISCOVERY_MAX_QUERIES = int(os.getenv("DISCOVERY_MAX_QUERIES", "6"))
+# Queries are spread over these DDGS backends so one failing backend doesn't stall discovery
+DISCOVERY_BACKENDS = [b.strip() for b in os.getenv("DISCOVERY_BACKENDS", "html,lite").split(",") if b.strip()]
+
+LOCATION = re.compile(r'^(.*?)\s+(?:in|near|around)\s+(.+)$', re.IGNORECASE)
+SYNONYMS = {
+    'agency': ['firm', 'studio'],
+    'agencies': ['firms', 'studios'],
+    'firm': ['agency', 'company'],
+    'firms': ['agencies', 'companies'],
+    'company': ['firm', 'business'],
+    'companies': ['firms', 'businesses'],
+    'consultant': ['consulting firm', 'advisor'],
+    'consultants': ['consulting firms', 'advisors'],
+    'consulting': ['consultancy', 'advisory'],
+    'lawyer': ['law firm', 'attorney'],
+    'lawyers': ['law firms', 'attorneys'],
+    'clinic': ['practice', 'center'],
+    'clinics': ['practices', 'centers'],
+    'contractor': ['contracting company', 'builder'],
+    'contractors': ['contracting companies', 'builders'],
+    'shop': ['store', 'studio'],
+}
+
+
+def query_variants(niche, limit=DISCOVERY_MAX_QUERIES):
+    """
+    Search queries for a niche: the original 'official website' query, then
+    'services' forms, synonym swaps and location-first phrasings.
+    """
+    niche = " ".join(niche.split())
+    match = LOCATION.match(niche)
+    base, location = (match.group(1), match.group(2)) if match else (niche, "")
+    where = f" in {location}" if location else ""
+
+    variants = [f'{niche} official website', f'{base} services{where}']
+    words = base.split()
+    for i, word in enumerate(words):
+        for synonym in SYNONYMS.get(word.lower(), []):
+            variants.append(" ".join(words[:i] + [synonym] + words[i + 1:]) + where)
+    if location:
+        variants += [f'{location} {base}', f'{base} near {location}']
+    else:
+        variants.append(f'{niche} company')
+
+    unique = []
+    for v in variants:
+        if v.lower() not in (u.lower() for u in unique):
+            unique.append(v)
+    return unique[:limit]
+
 
 class LeadDiscoverer:
     def __init__(self):
         self.db = HistoryDB()
-        self.blacklist_domains = [
-            'clutch.co', 'yelp.com', 'linkedin.com', 'facebook.com', 
-            'instagram.com', 'twitter.com', 'glassdoor.com', 'upwork.com',
-            'expert.com', 'wikipedia.org', 'crunchbase.com',
-            'yellowpages.com', 'bbb.org', 'angis.com', 'houzz.com', 'thumbtack.com',
-            'expertise.com', 'upcity.com', 'designrush.com', 
-            'goodfirms.co', 'sortlist.com', 'topagencies', 'bestagencies', 
-            'agencies.com', 'directory', 'listing', 'review',
-            'builtinaustin.com', 'nogood.io', 'writingstudio.com',
-            'medium.com', 'hubspot.com', 'wordpress.com',
-            'zhihu.com', 'quora.com', 'reddit.com', 'stackoverflow.com',
-            'youtube.com', 'vimeo.com', 'slideshare.net', 'issuu.com', 'clutch.co', 'expertise.com', 'yelp.com', 'linkedin.com', 'facebook.com', 
-            'instagram.com', 'twitter.com', 'glassdoor.com', 'upwork.com', 'bbb.org',
-            'yellowpages.com', 'angis.com', 'houzz.com', 'thumbtack.com', 'zillow.com', 'realtor.com'
-        ]
-        
-        self.path_blacklist = [
-            '/blog/', '/articles/', '/news/', '/post/', 
-            '/list/', '/top-', '/best-', '/directory/', '/review/',
-            '/question/', '/answer/', '/topic/'
-        ]
+        self.blacklist = shared_blacklist()
 
     def is_blacklisted(self, url):
-        parsed = urlparse(url)
-        domain = parsed.netloc.lower()
-        path = parsed.path.lower()
-        
-        for b in self.blacklist_domains:
-            if b in domain:
-                return True
-        
-        for p in self.path_blacklist:
-            if p in path:
-                return True
-        
-        return False
-
-    def find_companies(self, niche_query, count=3):
-        # SIMPLIFIED QUERY: Just the niche + "official website"
-        # We removed the hard quotes and multiple -site operators to get more results
-        search_query = f'{niche_query} official website'
-        
-        print(f"[*] Discoverer: Searching for '{niche_query}'...")
-        potential_leads = []
-        
+        return self.blacklist.is_blacklisted(url)
+
+    def _is_candidate(self, r):
+        """Cheap result filters: directories, listicle titles and path garbage."""
+        return self.blacklist.screen(r.get('href', ''), r.get('title', '')) is None
+
+    @metrics.timed("discover")
+    def _search(self, query, max_results, backend):
         try:
-            with DDGS() as ddgs:
-                search_results = ddgs.text(
-                    search_query, 
-                    region='us-en', 
-                    backend='html', 
-                    max_results=40 # Grab a decent pool
-                )
-                
-                if not search_results:
-                    print("[!] DuckDuckGo returned zero raw results. Try a broader niche.")
-                    return []
-
-                for r in search_results:
-                    url = r.get('href', '').lower()
-                    title = r.get('title', '').lower()
-                    domain = urlparse(url).netloc
-                    
-                    # DEBUG: Let's see what's being rejected
-                    
-                    # 0. CHECK HISTORY
-                    if self.db.exists(url):
-                        print(f"   [x] Skipping history: {url}")
-                        continue
-
-                    # 1. Filter Directories
-                    if any(b in domain for b in self.blacklist_domains):
-                        # print(f"   [x] Skipping directory: {domain}")
-                        continue
-                    
-                    # 2. Filter Listicles/Blogs based on Title
-                    if any(x in title for x in ['top ', 'best ', '10 ', '20 ', 'reviews']):
-                        # print(f"   [x] Skipping listicle title: {title[:30]}")
-                        continue
-                        
-                    # 3. Filter specific path garbage but be careful
-                    if any(x in url for x in ['/directory/', '/category/', '/tags/']):
-                        continue
-
-                    potential_leads.append({
-                        "name": r.get('title', 'Unknown'),
-                        "url": url
-                    })
-                        
+            return query, web_search(query, max_results=max_results, backend=backend)
         except Exception as e:
-            print(f"[!] Discoverer Search Error: {e}")
-        
-        print(f"[+] Discoverer: Found {len(potential_leads)} potential leads to audit.")
-        return potential_leads
\ No newline at end of file
+            print(f"[!] Discoverer Search Error ({backend}, '{query}'): {e}")
+            metrics.fail(e)
+            return query, []
+
+    async def stream_companies(self, niche_query):
+        """
+        Yields {"name", "url"} leads as soon as their query returns. Each round
+        runs every query variant concurrently (paced by the shared DDGS limiter);
+        the next, deeper round only starts if the consumer keeps asking, so
+        discovery stops as soon as the campaign has enough leads. Leads are
+        deduped by canonical domain across queries and rounds, and each lead
+        carries it as "domain".
+        """
+        queries = query_variants(niche_query)
+        print(f"[*] Discoverer: Searching for '{niche_query}' with {len(queries)} queries...")
+        seen_domains = set()
+        exhausted = set()
+        yielded = 0
+
+        for round_no, page_size in enumerate(DISCOVERY_PAGE_SIZES, 1):
+            active = [q for q in queries if q not in exhausted]
+            if not active:
+                break
+            started = time.perf_counter()
+            searches = [
+                asyncio.ensure_future(run_blocking(self._search, q, page_size, DISCOVERY_BACKENDS[i % len(DISCOVERY_BACKENDS)]))
+                for i, q in enumerate(active)
+            ]
+            new_in_round = 0
+            try:
+                for done in asyncio.as_completed(searches):
+                    query, results = await done
+                    # Fewer hits than asked for: a deeper round won't find more
+                    if len(results) < page_size:
+                        exhausted.add(query)
+
+                    # One aliases lookup and one history lookup per result page instead of per hit
+                    candidates = [r for r in results if self._is_candidate(r)]
+                    canonical = await asyncio.to_thread(self.db.domains.canonical_many, [r.get('href', '').strip() for r in candidates])
+                    fresh = []
+                    for r in candidates:
+                        url = r.get('href', '').strip()
+                        domain = canonical.get(url)
+                        if not domain or domain in seen_domains:
+                            continue
+                        seen_domains.add(domain)
+                        fresh.append({"name": r.get('title', 'Unknown'), "url": url, "domain": domain})
+
+                    seen_before = await asyncio.to_thread(self.db.known_domains, [lead['domain'] for lead in fresh])
+                    for lead in fresh:
+                        if lead['domain'] in seen_before:
+                            print(f"   [x] Skipping history: {lead['url']}")
+                            continue
+                        new_in_round += 1
+                        yielded += 1
+                        yield lead
+            finally:
+                # Consumer stopped early: don't leave searches running unobserved
+                for task in searches:
+                    task.cancel()
+
+            print(f"[+] Discoverer: round {round_no} ({page_size}/query) found {new_in_round} new leads "
+                  f"in {time.perf_counter() - started:.1f}s")
+
+        if not yielded:
+            print("[!] Search returned no usable results. Try a broader niche.")
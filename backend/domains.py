@@ -0,0 +1,64 @@
+"""
+Canonical company domains. Every place that asks "have we seen this company?"
+(discovery, history, results) keys on the registrable domain, so
+https://www.acme.com/contact-us/new-york/, acme.com and blog.acme.com are one
+company while acme.co.uk and acme.github.io stay separate ones.
+
+Uses tldextract (its bundled Public Suffix List snapshot, no network) when it
+is installed, otherwise a short list of the multi-label suffixes we run into.
+"""
+import ipaddress
+from urllib.parse import urlparse
+
+try:
+    import tldextract
+    # Private suffixes too, so every *.github.io / *.wixsite.com site is its own company
+    _extract = tldextract.TLDExtract(suffix_list_urls=(), include_psl_private_domains=True)
+except ImportError:
+    _extract = None
+
+# Fallback suffixes with more than one label: country second levels and site builders
+MULTI_LABEL_SUFFIXES = frozenset({
+    "co.uk", "org.uk", "ac.uk", "gov.uk", "ltd.uk", "plc.uk", "me.uk",
+    "com.au", "net.au", "org.au", "co.nz", "org.nz", "co.za", "co.in", "co.jp", "co.kr",
+    "com.br", "com.mx", "com.ar", "com.sg", "com.hk", "com.tr", "com.cn", "com.tw", "com.my",
+    "github.io", "netlify.app", "vercel.app", "herokuapp.com", "pages.dev", "web.app", "firebaseapp.com",
+    "wixsite.com", "squarespace.com", "wordpress.com", "blogspot.com", "myshopify.com", "webflow.io",
+    "carrd.co", "godaddysites.com", "weebly.com",
+})
+
+
+def host(url):
+    """Lowercased host without port, credentials or trailing dot. Accepts bare hosts ("acme.com/about")."""
+    if not url:
+        return ""
+    url = url.strip()
+    if "//" not in url:
+        url = "//" + url
+    try:
+        hostname = urlparse(url).hostname or ""
+    except ValueError:
+        return ""
+    return hostname.rstrip(".")
+
+
+def registrable_domain(url):
+    """acme.com for https://www.blog.acme.com/x; IPs and single-label hosts come back unchanged."""
+    name = host(url)
+    if not name or "." not in name:
+        return name
+    try:
+        ipaddress.ip_address(name)
+        return name
+    except ValueError:
+        pass
+
+    if _extract is not None:
+        parts = _extract(name)
+        if parts.domain and parts.suffix:
+            return f"{parts.domain}.{parts.suffix}"
+        return name
+
+    labels = name.split(".")
+    suffix_labels = 2 if ".".join(labels[-2:]) in MULTI_LABEL_SUFFIXES else 1
+    return ".".join(labels[-(suffix_labels + 1):])
@@ -0,0 +1,132 @@
+"""
+Websocket event delivery. A campaign emits several events per lead
+(node_active, node_done, logs, draft deltas); sending each as its own frame
+makes the frontend re-render the graph for every one. The coalescer buffers
+them per client and sends one "batch" frame every EVENT_FLUSH_INTERVAL or
+EVENT_BATCH_SIZE events:
+
+    {"type": "batch",
+     "events": [...],                                  # everything else, in order
+     "leads": {url: {"node": "3", "status": "done"}},  # stage changes since the last batch
+     "nodes": {"1": "active"}}                         # node events without a lead (Discovery)
+
+Node events collapse into the per-lead stage-status model, so a lead that
+went through two stages within one interval is a single entry. A client
+that attaches late gets the campaign's whole model as a "lead_stages" event.
+"""
+import asyncio
+import os
+
+EVENT_FLUSH_INTERVAL = float(os.getenv("EVENT_FLUSH_INTERVAL_MS", "100")) / 1000
+EVENT_BATCH_SIZE = int(os.getenv("EVENT_BATCH_SIZE", "50"))
+
+NODE_STATUS = {"node_active": "active", "node_done": "done", "node_error": "error"}
+# Only the newest of these matters to the UI
+LATEST_ONLY = {"queue", "pipeline_stats"}
+# Sent right away, along with whatever is buffered before them
+URGENT = {"error"}
+
+
+class LeadStages:
+    """Where each lead is: the node it last entered and whether it is active there, done or rejected."""
+    def __init__(self):
+        self.leads = {}
+
+    def update(self, event):
+        """Records a node event. False for anything that isn't one, or has no lead."""
+        status = NODE_STATUS.get(event.get("type"))
+        if status is None or not event.get("lead"):
+            return False
+        self.leads[event["lead"]] = {"node": event["node"], "status": status}
+        return True
+
+    def merge(self, leads):
+        self.leads.update(leads)
+
+    def snapshot(self):
+        return dict(self.leads)
+
+
+class EventCoalescer:
+    """
+    Stands in for a client's send(): add() buffers, the frame goes out from
+    a timer or once the batch is full. A failed send is raised from the next
+    add(), so CampaignJob drops the client as it would on a direct send.
+    """
+    def __init__(self, send, interval=EVENT_FLUSH_INTERVAL, max_events=EVENT_BATCH_SIZE):
+        self.send = send
+        self.interval = interval
+        self.max_events = max_events
+        self.events = []
+        self.leads = LeadStages()
+        self.nodes = {}
+        self.pending = 0
+        self.timer = None
+        self.error = None
+        # Batches leave in the order they were cut
+        self.send_lock = asyncio.Lock()
+
+    async def add(self, event):
+        if self.error is not None:
+            raise self.error
+        kind = event.get("type")
+        if kind == "lead_stages":
+            self.leads.merge(event["leads"])
+        elif kind in NODE_STATUS:
+            if not self.leads.update(event):
+                self.nodes[event["node"]] = NODE_STATUS[kind]
+        elif not self._merge(event):
+            self.events.append(event)
+        self.pending += 1
+
+        if kind in URGENT or self.pending >= self.max_events:
+            await self.flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.interval, self._flush_later)
+
+    def _merge(self, event):
+        """Folds the event into a buffered one where the UI only needs the sum or the newest."""
+        kind = event["type"]
+        if kind in LATEST_ONLY:
+            for i, buffered in enumerate(self.events):
+                if buffered["type"] == kind:
+                    del self.events[i]
+                    break
+            return False
+        if kind == "draft_delta" and self.events and not event.get("reset"):
+            last = self.events[-1]
+            if (last["type"] == "draft_delta" and not last.get("reset")
+                    and last["lead"] == event["lead"] and last["field"] == event["field"]):
+                self.events[-1] = {**last, "delta": last["delta"] + event["delta"]}
+                return True
+        return False
+
+    def _flush_later(self):
+        self.timer = None
+        asyncio.ensure_future(self._flush_quietly())
+
+    async def _flush_quietly(self):
+        try:
+            await self.flush()
+        except Exception as e:
+            self.error = e  # Client went away; the next add() tells the campaign
+
+    async def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return
+        batch = {"type": "batch", "events": self.events}
+        if self.leads.leads:
+            batch["leads"] = self.leads.snapshot()
+        if self.nodes:
+            batch["nodes"] = self.nodes
+        self.events, self.leads, self.nodes, self.pending = [], LeadStages(), {}, 0
+        async with self.send_lock:
+            await self.send(batch)
+
+    async def close(self):
+        """Sends what is still buffered (e.g. the final log before the socket closes)."""
+        if self.error is None:
+            await self.flush()
@@ -0,0 +1,341 @@
+"""
+Local stand-ins for Firecrawl, the search backend, the OpenAI-compatible LLM
+servers and the social profile hosts, for benchmarks that must not spend
+credits or tokens. Everything is deterministic per URL/prompt; latency and
+failures are drawn from a seeded RNG.
+
+    backends = FakeBackends(llm_latency=0.3, llm_failure_rate=0.02).start()
+    os.environ["FIRECRAWL_API_URL"] = backends.url
+    ...
+    backends.stop()
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+
+NICHE_WORDS = ["Apex", "Blue", "Cedar", "Delta", "Ember", "Forge", "Granite", "Harbor", "Iron", "Juniper", "Keystone", "Lumen"]
+FIRST_NAMES = ["Jane", "Marcus", "Priya", "Tom", "Elena", "Sam", "Aisha", "Luca"]
+LAST_NAMES = ["Doe", "Reyes", "Shah", "Miller", "Novak", "Chen", "Okafor", "Rossi"]
+
+
+def _digest(*parts):
+    return int(hashlib.md5("|".join(str(p) for p in parts).encode()).hexdigest(), 16)
+
+
+def _slug(name):
+    return re.sub(r'[^a-z0-9]+', '', name.lower())
+
+
+def company_for(url):
+    """Deterministic company facts for a fake site."""
+    host = urlparse(url).netloc.lower().replace("www.", "")
+    h = _digest(host)
+    name = f"{NICHE_WORDS[h % len(NICHE_WORDS)]} {NICHE_WORDS[(h // 7) % len(NICHE_WORDS)]} Studio"
+    founder = f"{FIRST_NAMES[(h // 13) % len(FIRST_NAMES)]} {LAST_NAMES[(h // 17) % len(LAST_NAMES)]}"
+    return {
+        "host": host,
+        "name": name,
+        "founder": founder,
+        "qualified": h % 10 < 7,       # ~70% pass the Gatekeeper
+        "empty": h % 20 == 0,          # ~5% "coming soon" pages
+        "footer_socials": h % 5 < 2,   # ~40% link both profiles in the footer
+        "has_about": h % 3 != 0,
+        # ~5% moved to another domain (rebrands), Firecrawl reports where it ended up
+        "redirect": f"https://www.site{h % 2000}.com/" if h % 20 == 1 else None,
+    }
+
+
+def page_markdown(url, pages=None):
+    """One of the stored pages (picked by host and path) when given, otherwise a generated page."""
+    info = company_for(url)
+    path = urlparse(url).path.rstrip("/")
+    if pages:
+        stored = pages[_digest(info["host"], path) % len(pages)]
+        if stored:
+            return stored
+    if info["empty"]:
+        return ""
+    if path == "/about":
+        return (
+            f"# About {info['name']}\n\n## Our team\n\n"
+            f"{info['founder']} is the founder and CEO of {info['name']}.\n"
+            f"Our leadership team has 15 years of experience.\n"
+        )
+
+    lines = [
+        f"# {info['name']}",
+        "[Home](/) [Services](/services) [Blog](/blog) [Contact](/contact)",
+        "",
+        "## What we do",
+        f"{info['name']} is an independent agency helping local businesses grow.",
+    ]
+    if info["qualified"]:
+        lines += [
+            "", "## Services",
+            "Brand strategy, web design and paid campaigns for 40+ clients.",
+            "", "## Work with us",
+            "Book a call with our team or get in touch below. Contact us for a free consultation.",
+            "", "## Careers", "We are hiring a project manager.",
+        ]
+    else:
+        lines += ["", "## Blog", "Read our latest thoughts on design trends.", "Coming soon: our new shop."]
+    if info["has_about"]:
+        lines += ["", "[About us](/about)"]
+    if info["footer_socials"]:
+        slug = _slug(info["founder"])
+        lines += ["", f"[X](https://x.com/{slug}) [LinkedIn](https://linkedin.com/in/{slug})"]
+    lines += ["", "© 2024 All rights reserved. Privacy policy."]
+    return "\n".join(lines)
+
+
+def search_results(query, max_results):
+    """Company sites plus the directory/listicle noise real searches return."""
+    results = []
+    for i in range(max_results):
+        h = _digest(query, i)
+        if i % 9 == 4:
+            results.append({"href": f"https://www.yelp.com/search?q={i}", "title": f"Top 10 {query}", "body": "Reviews"})
+        elif i % 11 == 7:
+            results.append({"href": f"https://www.agencyguide{h % 50}.com/blog/best-agencies", "title": f"Best {query}", "body": ""})
+        else:
+            # Overlapping pool across queries, like real result pages
+            results.append({"href": f"https://www.site{h % 2000}.com/", "title": f"Site {h % 2000}", "body": query})
+    return results
+
+
+def llm_reply(messages):
+    """A plausible JSON answer for each of the agents' prompts."""
+    system = " ".join(m["content"] for m in messages if m["role"] == "system")
+    user = messages[-1]["content"]
+    text = system + "\n" + user
+
+    if "### LEAD" in user:
+        profiles = []
+        for block in re.split(r'### LEAD ', user)[1:]:
+            lead_id, _, content = block.partition("\n")
+            profiles.append({"id": lead_id.strip(), **_profile(content)})
+        return {"profiles": profiles}
+    if "Operations Audit Bot" in text:
+        return _profile(user)
+    if "elite B2B Copywriter" in text:
+        company = re.search(r'Target: (.*)', user)
+        company = company.group(1).strip() if company else "your team"
+        return {"subject": f"idea for {company.lower()}", "body": f"Hi there,\n\nQuick idea for {company}.\n\nBest,\nKrykos Team"}
+
+    founder = re.search(r'([A-Z][a-z]+ [A-Z][a-z]+) is the founder', user)
+    name = founder.group(1) if founder else "Unknown"
+    slug = _slug(name) if founder else ""
+    if "Identify the Founder/CEO" in text or "Find X and LinkedIn links" in text:
+        return {
+            "name": name,
+            "x_url": f"https://x.com/{slug}" if slug else "",
+            "linkedin_url": f"https://linkedin.com/in/{slug}" if slug else "",
+        }
+    return {"name": name}
+
+
+def _profile(content):
+    lowered = content.lower()
+    qualified = "contact us" in lowered or "book a call" in lowered or "careers" in lowered
+    title = re.search(r'^#\s+(.*)$', content, re.MULTILINE)
+    return {
+        "is_qualified_business": qualified,
+        "reason_for_disqualification": "" if qualified else "No clear service offering",
+        "company_name": title.group(1).strip() if title else "Unknown",
+        "core_business": "Independent agency",
+        "operational_pain_points": ["Manual data entry from contact forms into CRM", "Resume filtering"],
+        "krykos_automation_hypothesis": "An AI agent that routes form leads straight into the CRM.",
+    }
+
+
+class FakeBackends:
+    """
+    One threaded HTTP server that speaks just enough of each API:
+      POST /v1/chat/completions     OpenAI-compatible (Ollama and DeepSeek), streamed or not
+      POST /v1/scrape, /v2/scrape   Firecrawl
+      GET  /search?q=&max_results=  JSON search results (SEARCH_API_URL)
+    """
+    def __init__(self, llm_latency=0.2, llm_jitter=0.1, llm_failure_rate=0.0, scrape_latency=0.3,
+                 search_latency=0.4, pages=None, seed=7):
+        self.llm_latency = llm_latency
+        self.llm_jitter = llm_jitter
+        self.llm_failure_rate = llm_failure_rate
+        self.scrape_latency = scrape_latency
+        self.search_latency = search_latency
+        self.pages = pages
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"llm": 0, "llm_failed": 0, "scrape": 0, "search": 0}
+        self.server = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def _count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+            return self.counts[name]
+
+    def _draw(self):
+        with self.lock:
+            return self.rng.random(), self.rng.random()
+
+    def start(self):
+        backends = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if parsed.path == "/search":
+                    params = parse_qs(parsed.query)
+                    backends._count("search")
+                    time.sleep(backends.search_latency)
+                    results = search_results(params.get("q", [""])[0], int(params.get("max_results", ["10"])[0]))
+                    return self._send(200, results)
+                self._send(404, {"error": "not found"})
+
+            def do_POST(self):
+                path = urlparse(self.path).path
+                payload = self._body()
+                if path in ("/v1/scrape", "/v2/scrape"):
+                    backends._count("scrape")
+                    time.sleep(backends.scrape_latency)
+                    url = payload.get("url", "")
+                    final_url = company_for(url)["redirect"] or url
+                    markdown = page_markdown(final_url, backends.pages)
+                    metadata = {"sourceURL": url, "url": final_url, "statusCode": 200}
+                    return self._send(200, {"success": True, "data": {"markdown": markdown, "metadata": metadata}})
+                if path.endswith("/chat/completions"):
+                    return self._completion(payload)
+                self._send(404, {"error": "not found"})
+
+            def _completion(self, payload):
+                call = backends._count("llm")
+                fail, jitter = backends._draw()
+                latency = max(0.0, backends.llm_latency + (jitter * 2 - 1) * backends.llm_jitter)
+                content = json.dumps(llm_reply(payload.get("messages", [])))
+                prompt_tokens = sum(len(m.get("content", "")) for m in payload.get("messages", [])) // 4
+                completion_tokens = len(content) // 4
+                usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                         "total_tokens": prompt_tokens + completion_tokens}
+                if payload.get("stream"):
+                    return self._stream(call, payload, content, usage, latency, fail < backends.llm_failure_rate)
+
+                time.sleep(latency)
+                if fail < backends.llm_failure_rate:
+                    backends._count("llm_failed")
+                    return self._send(500, {"error": {"message": "fake upstream error", "type": "server_error"}})
+                self._send(200, {
+                    "id": f"chatcmpl-{call}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": payload.get("model", "fake"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": usage,
+                })
+
+            def _stream(self, call, payload, content, usage, latency, fail):
+                """Server-sent events, ~4 characters per chunk; the first after a fifth of the latency."""
+                if fail:
+                    time.sleep(latency * 0.2)
+                    backends._count("llm_failed")
+                    return self._send(500, {"error": {"message": "fake upstream error", "type": "server_error"}})
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                def event(delta, finish=None, usage=None):
+                    chunk = {"id": f"chatcmpl-{call}", "object": "chat.completion.chunk", "created": int(time.time()),
+                             "model": payload.get("model", "fake"),
+                             "choices": [] if usage else [{"index": 0, "delta": delta, "finish_reason": finish}]}
+                    if usage:
+                        chunk["usage"] = usage
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+
+                pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+                time.sleep(latency * 0.2)
+                event({"role": "assistant", "content": ""})
+                for piece in pieces:
+                    event({"content": piece})
+                    time.sleep(latency * 0.8 / len(pieces))
+                event({}, finish="stop")
+                if (payload.get("stream_options") or {}).get("include_usage"):
+                    event(None, usage=usage)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def profile_outcome(url, dead_rate=0.2, blocked_rate=0.0):
+    """What the fake profile hosts do with `url`: "alive", "dead" or "blocked" (every request refused)."""
+    roll = _digest(urlparse(url).path) % 100
+    if roll < dead_rate * 100:
+        return "dead"
+    if roll < (dead_rate + blocked_rate) * 100:
+        return "blocked"
+    return "alive"
+
+
+def profile_transport(dead_rate=0.2, blocked_rate=0.0, requests=None):
+    """
+    httpx transport answering the social profile checks locally. Like the real
+    hosts, X answers 200 with an "account doesn't exist" page for missing
+    profiles, LinkedIn refuses HEAD (405) and blocked profiles get LinkedIn's 999.
+    Pass a list as `requests` to record (method, url) of every request.
+    """
+    def handle(request):
+        if requests is not None:
+            requests.append((request.method, str(request.url)))
+        outcome = profile_outcome(str(request.url), dead_rate, blocked_rate)
+        host = request.url.host
+        if outcome == "blocked":
+            return httpx.Response(999)
+        if host in ("x.com", "twitter.com"):
+            if outcome == "dead":
+                return httpx.Response(200, text="<html>Hmm...this account doesn’t exist. Try searching for another.</html>")
+            return httpx.Response(200, text="<html>profile</html>")
+        if host.endswith("linkedin.com") and request.method == "HEAD":
+            return httpx.Response(405)
+        if outcome == "dead":
+            return httpx.Response(404)
+        return httpx.Response(200, text="<html>profile</html>")
+    return httpx.MockTransport(handle)
@@ -1,38 +1,109 @@
-import os, json, time, random
-from duckduckgo_search import DDGS
-from openai import OpenAI
-import requests
+import os, json
+
+from llm import LLMClient
+from search import web_search
+from validator import SocialURLValidator
+import metrics
+
+# One search + one combined completion per lead. Set to 0 to go back to the
+# old name -> search -> links sequence (kept for benchmarking).
+HUNTER_SINGLE_PASS = os.getenv("HUNTER_SINGLE_PASS", "1") != "0"
 
 class IdentityHunter:
     def __init__(self):
-        self.ai = OpenAI(api_key=os.getenv("OLLAMA_API_KEY", "ollama"), base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/v1"))
-        self.model = os.getenv("OLLAMA_MODEL", "qwen2.5:7b")
+        self.llm = LLMClient(
+            api_key=os.getenv("OLLAMA_API_KEY", "ollama"),
+            base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/v1"),
+            model=os.getenv("OLLAMA_MODEL", "qwen2.5:7b"),
+            backend="ollama"
+        )
+        self.validator = SocialURLValidator()
+
+    async def validate_profiles(self, decision_maker):
+        """IMPROVEMENT 2: Mandatory URL Validation (X and LinkedIn checked in parallel)"""
+        x_url, linkedin_url = await self.validator.validate_many([
+            decision_maker.get("x_url"), decision_maker.get("linkedin_url")
+        ])
+        return {**decision_maker, "x_url": x_url, "linkedin_url": linkedin_url}
 
-    def validate_url(self, url):
-        """IMPROVEMENT 2: Mandatory URL Validation"""
-        if not url or "http" not in url: return ""
+    @metrics.timed("hunter_name")
+    def _extract_name(self, company_name, site_context, use_cache, stats):
+        extract_prompt = f"Analyze site text for {company_name}. Find the Founder/CEO. If not found, return 'Unknown'. Text: {site_context[:4000]}"
         try:
-            # We use a real User-Agent to avoid being blocked by X during a ping
-            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'}
-            response = requests.get(url, headers=headers, timeout=5)
-            # If 404 or "This account doesn't exist" in text, it's garbage
-            if response.status_code == 404 or "account doesn't exist" in response.text.lower():
-                return ""
-            return url
-        except:
-            return url # Fallback if request fails but we aren't sure
+            res = self.llm.complete(messages=[{"role": "user", "content": extract_prompt}], response_format={'type': 'json_object'}, use_cache=use_cache, stats=stats)
+            return json.loads(res).get("name", "Unknown")
+        except Exception as e:
+            metrics.fail(e)
+            return "Unknown"
+
+    def find_decision_maker(self, company_name, site_context, site_socials, use_cache=True, stats=None, single_pass=None):
+        if single_pass is None:
+            single_pass = HUNTER_SINGLE_PASS
+        if not single_pass:
+            return self._find_decision_maker_two_pass(company_name, site_context, site_socials, use_cache, stats)
+
+        x_site, li_site = site_socials.get("x_from_site"), site_socials.get("li_from_site")
+
+        # Fast path: the site already links both profiles, we only need the name
+        if x_site and li_site:
+            print("   [+] Found socials directly on website footer.")
+            full_name = self._extract_name(company_name, site_context, use_cache, stats)
+            return {"full_name": full_name, "x_url": x_site, "linkedin_url": li_site, "found_via": "footer"}
+
+        # Search by company (no name needed up front), then one completion reads
+        # site text + results and returns the name and both links together
+        with metrics.span("hunter_search") as span:
+            try:
+                results = web_search(f'{company_name} founder CEO (site:linkedin.com OR site:x.com)', max_results=5)
+                search_text = "\n".join([f"{r['href']} - {r['body']}" for r in results])
+            except Exception as e:
+                print(f"[!] Hunter search failed: {e}")
+                span.fail(e)
+                search_text = "No results."
+
+        combined_prompt = f"""
+            Identify the Founder/CEO of {company_name} and their social profiles.
+            Only use links that appear in the site text or search results below.
+
+            OUTPUT FORMAT (JSON):
+            {{"name": "Full Name or Unknown", "x_url": "profile link or empty", "linkedin_url": "profile link or empty"}}
+
+            SITE TEXT:
+            {site_context[:4000]}
+
+            SEARCH RESULTS:
+            {search_text}
+            """
+        with metrics.span("hunter_links") as span:
+            try:
+                data = json.loads(self.llm.complete(
+                    messages=[{"role": "user", "content": combined_prompt}],
+                    response_format={'type': 'json_object'},
+                    use_cache=use_cache,
+                    stats=stats
+                ))
+                if not isinstance(data, dict):
+                    raise ValueError(f"expected a JSON object, got {type(data).__name__}")
+                name, x_url, linkedin_url = data.get("name"), data.get("x_url"), data.get("linkedin_url")
+            except Exception as e:
+                span.fail(e)
+                name, x_url, linkedin_url = None, "", ""
 
-    def find_decision_maker(self, company_name, site_context, site_socials):
+        # Footer links are usually more reliable than search results
+        return {
+            "full_name": name or "Unknown",
+            "x_url": x_site or x_url or "",
+            "linkedin_url": li_site or linkedin_url or "",
+            "found_via": "footer" if x_site else "search"
+        }
+
+    def _find_decision_maker_two_pass(self, company_name, site_context, site_socials, use_cache=True, stats=None):
         # Priority 1: Use what we found directly on the site
         if site_socials.get("x_from_site") or site_socials.get("li_from_site"):
             print(f"   [+] Found socials directly on website footer.")
 
         # Step 1: Extract name
-        extract_prompt = f"Analyze site text for {company_name}. Find the Founder/CEO. If not found, return 'Unknown'. Text: {site_context[:4000]}"
-        try:
-            res = self.ai.chat.completions.create(model=self.model, messages=[{"role": "user", "content": extract_prompt}], response_format={'type': 'json_object'})
-            full_name = json.loads(res.choices[0].message.content).get("name", "Unknown")
-        except: full_name = "Unknown"
+        full_name = self._extract_name(company_name, site_context, use_cache, stats)
 
         # Step 2: Formulate Search Query
         # If we have a name, search for person. If not, search for company profile.
@@ -43,24 +114,24 @@ class IdentityHunter:
 
         # Step 3: Search and Merge
         try:
-            time.sleep(random.uniform(2, 4))
-            with DDGS() as ddgs:
-                results = list(ddgs.text(query, region='us-en', backend='html', max_results=3))
-                search_text = "\n".join([f"{r['href']} - {r['body']}" for r in results])
-                
-                final_res = self.ai.chat.completions.create(
-                    model=self.model,
-                    messages=[{"role": "user", "content": f"Find X and LinkedIn links for {full_name} at {company_name}. Results: {search_text}"}],
-                    response_format={'type': 'json_object'}
-                )
-                data = json.loads(final_res.choices[0].message.content)
-                
-                # Combine site footer links with search links (Footer links are usually more reliable)
-                return {
-                    "full_name": full_name,
-                    "x_url": site_socials.get("x_from_site") or data.get("x_url", ""),
-                    "linkedin_url": site_socials.get("li_from_site") or data.get("linkedin_url", ""),
-                    "found_via": "footer" if site_socials.get("x_from_site") else "search"
-                }
+            # Paced by the shared DDGS rate limiter instead of a fixed random sleep
+            results = web_search(query, max_results=3)
+            search_text = "\n".join([f"{r['href']} - {r['body']}" for r in results])
+            
+            final_res = self.llm.complete(
+                messages=[{"role": "user", "content": f"Find X and LinkedIn links for {full_name} at {company_name}. Results: {search_text}"}],
+                response_format={'type': 'json_object'},
+                use_cache=use_cache,
+                stats=stats
+            )
+            data = json.loads(final_res)
+            
+            # Combine site footer links with search links (Footer links are usually more reliable)
+            return {
+                "full_name": full_name,
+                "x_url": site_socials.get("x_from_site") or data.get("x_url", ""),
+                "linkedin_url": site_socials.get("li_from_site") or data.get("linkedin_url", ""),
+                "found_via": "footer" if site_socials.get("x_from_site") else "search"
+            }
         except:
             return {"full_name": full_name, "x_url": site_socials.get("x_from_site"), "linkedin_url": site_socials.get("li_from_site")}
\ No newline at end of file
@@ -0,0 +1,487 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import deque
+
+from database import CampaignStore, TERMINAL_STAGES
+from events import LeadStages
+from pipeline import Pipeline, Stage
+from llm import UsageStats
+from prefilter import LeadPrefilter, PREFILTER_THRESHOLD
+from ratelimit import run_blocking
+from scheduler import Scheduler
+import metrics
+
+# Leads the Gatekeeper qualifies per LLM request (1 = one request per lead)
+GATEKEEPER_BATCH_SIZE = int(os.getenv("GATEKEEPER_BATCH_SIZE", "1"))
+STATS_INTERVAL = float(os.getenv("PIPELINE_STATS_INTERVAL", "2"))
+# Events kept per campaign so a client that (re)attaches sees what it missed
+EVENT_BACKLOG = int(os.getenv("CAMPAIGN_EVENT_BACKLOG", "500"))
+
+# Where a checkpointed lead re-enters the pipeline on resume
+RESUME_STAGE = {"discovered": "scrape", "scraped": "gatekeeper", "qualified": "hunter", "hunted": "writer"}
+
+
+def holds_slot(stage, lead):
+    """
+    True if a checkpointed lead took one of the campaign's target slots. A
+    lead that fails after qualifying keeps its slot, as it does in a live
+    run, so a resumed campaign doesn't go looking for a replacement.
+    """
+    return stage in ("qualified", "hunted", "done") or (stage == "failed" and "profile" in lead)
+
+
+class CampaignJob:
+    """
+    One campaign running server-side, independent of any websocket. Clients
+    attach to receive its events and may detach at any time. Every lead's
+    last completed stage is checkpointed, so a restarted process continues
+    from there instead of redoing scrapes and LLM calls.
+    """
+    def __init__(self, campaign_id, config, store, results_store, scheduler):
+        self.id = campaign_id
+        self.config = config
+        self.priority = max(1, int(config.get("priority", 1)))
+        self.store = store
+        self.results_store = results_store
+        self.scheduler = scheduler
+        self.subscribers = set()
+        self.backlog = deque(maxlen=EVENT_BACKLOG)
+        # Frames go out one at a time and in the same order to every client
+        self.send_lock = asyncio.Lock()
+        # Every lead's current node, for clients that attach after the backlog dropped its events
+        self.stages = LeadStages()
+        self.pipeline = None
+        self.task = None
+
+    async def emit(self, payload, replay=True):
+        """Sends to every attached client. replay=False keeps it out of the backlog (e.g. draft deltas)."""
+        async with self.send_lock:
+            self.stages.update(payload)
+            if replay:
+                self.backlog.append(payload)
+            for send in list(self.subscribers):
+                try:
+                    await send(payload)
+                except Exception:
+                    self.subscribers.discard(send)  # Client went away, the campaign carries on
+
+    async def attach(self, send):
+        """Replays the recent events to a client, then streams new ones to it."""
+        async with self.send_lock:
+            for payload in list(self.backlog):
+                await send(payload)
+            if self.stages.leads:
+                await send({"type": "lead_stages", "leads": self.stages.snapshot()})
+            self.subscribers.add(send)
+
+    def detach(self, send):
+        self.subscribers.discard(send)
+
+    async def checkpoint(self, lead, stage):
+        await asyncio.to_thread(self.store.checkpoint, self.id, lead['url'], stage, lead)
+
+    async def report_position(self, position):
+        await self.emit({"type": "queue", "position": position})
+        await self.emit({"type": "log", "message": f"⏳ Queued behind other campaigns (position {position})"})
+
+    async def run(self, resume=False):
+        try:
+            await self.scheduler.admit(self.id, self.priority, self.report_position)
+            try:
+                await self.emit({"type": "queue", "position": 0})
+                await self._run(resume)
+            finally:
+                await self.scheduler.leave(self.id)
+            await asyncio.to_thread(self.store.set_status, self.id, "done")
+        except asyncio.CancelledError:
+            # Process shutting down: the campaign stays 'running' and is resumed on restart
+            raise
+        except Exception as e:
+            print(f"Error: {e}")
+            await asyncio.to_thread(self.store.set_status, self.id, "failed")
+            await self.emit({"type": "error", "message": str(e)})
+
+    async def _run(self, resume):
+        config = self.config
+        # Agents and their backend clients are shared by every campaign in the process
+        agents = self.scheduler.agents
+        discoverer, scout, hunter, drafter, db = (
+            agents["discoverer"], agents["scout"], agents["hunter"], agents["drafter"], agents["db"]
+        )
+
+        niche = config.get("niche")
+        target_count = int(config.get("count", 1))
+        # A campaign may use every slot of a stage while nobody else needs them;
+        # "workers" caps it lower
+        workers = {name: share.capacity for name, share in self.scheduler.stages.items()}
+        workers.update(config.get("workers", {}))
+        force_refresh = bool(config.get("force_refresh", False))
+        batch_size = max(1, int(config.get("gatekeeper_batch_size", GATEKEEPER_BATCH_SIZE)))
+        # null turns the local pre-qualification filter off
+        prefilter = LeadPrefilter(config.get("prefilter_threshold", PREFILTER_THRESHOLD))
+        # Stages that skip the LLM completion cache, e.g. ["writer"] while tuning its prompt
+        cache_bypass = set(config.get("cache_bypass", []))
+        # Push the Writer's subject/body to the UI as they are generated
+        stream_drafts = bool(config.get("stream_drafts", True))
+        llm_stats = UsageStats()
+
+        # Spans started by this campaign's tasks and threads carry its id
+        metrics.bind(campaign=self.id)
+        metric_listener = None
+        if config.get("metrics"):
+            loop = asyncio.get_running_loop()
+
+            def forward_metric(event):
+                if event.get("campaign") == self.id:
+                    loop.call_soon_threadsafe(lambda: asyncio.ensure_future(self.emit(event)))
+            metric_listener = forward_metric
+            metrics.registry().subscribe(metric_listener)
+
+        # Leads this campaign already took somewhere, by their last completed stage
+        checkpoints = await asyncio.to_thread(self.store.leads, self.id) if resume else []
+        known_urls = {url for url, _, _ in checkpoints}
+        # Canonical domains this campaign has taken, so redirects and query
+        # variants can't bring the same company in twice
+        claimed = set((await asyncio.to_thread(db.domains.canonical_many, list(known_urls))).values()) if known_urls else set()
+
+        qualified_found = sum(1 for _, stage, lead in checkpoints if holds_slot(stage, lead))
+        target_reached = asyncio.Event()
+        # Serializes the target check with the "qualified" checkpoint
+        claim_lock = asyncio.Lock()
+        prefiltered = 0
+        gatekeeper_seconds = 0.0
+        gatekeeper_leads = 0
+
+        async def finish(lead, stage):
+            # Only leads that reached a verdict go into the history. Leads dropped
+            # mid-flight (target reached, restart) stay available for later campaigns.
+            await self.checkpoint(lead, stage)
+            if stage != "failed":
+                await asyncio.to_thread(db.add, lead['url'])
+
+        if resume:
+            await self.emit({"type": "log", "message": (
+                f"Resuming campaign for {target_count} targets in: {niche} "
+                f"({len(checkpoints)} leads checkpointed, {qualified_found} qualified)"
+            )})
+        else:
+            await self.emit({"type": "log", "message": f"Scanning for {target_count} targets in: {niche}..."})
+        await self.emit({"type": "node_active", "node": "1"})
+
+        # --- SCOUT ---
+        async def scrape_stage(lead):
+            nonlocal prefiltered
+            metrics.bind(lead=lead['url'])
+            if await asyncio.to_thread(db.exists, lead['url']):
+                await self.emit({"type": "log", "message": f"Skipping {lead['url']} (In History)"})
+                return None
+
+            await self.emit({"type": "log", "message": f"Processing: {lead['url']}"})
+            await self.emit({"type": "node_active", "node": "2", "lead": lead['url']})
+            site_data = await run_blocking(scout.scrape_website, lead['url'], force_refresh)
+            await self.emit({"type": "node_done", "node": "2", "lead": lead['url']})
+
+            # Redirected to another domain: remember the alias so later searches skip
+            # it before scraping, and drop this lead if that company is already taken
+            final_url = site_data.get("final_url") or lead['url']
+            domain = lead.get('domain') or await asyncio.to_thread(db.domains.canonical, lead['url'])
+            final_domain = await asyncio.to_thread(db.domains.add_alias, lead['url'], final_url)
+            if final_domain and final_domain != domain:
+                if final_domain in claimed or await asyncio.to_thread(db.known_domains, [final_domain]):
+                    await finish(lead, "rejected")
+                    await self.emit({"type": "log", "message": f"Skipping {lead['url']} (redirects to {final_domain}, already processed)"})
+                    return None
+                claimed.add(final_domain)
+
+            # Empty pages are usually transient scrape failures; keep them out of the history
+            if not site_data["main_md"]:
+                await finish(lead, "failed")
+                await self.emit({"type": "log", "message": f"⚠️ Empty page for {lead['url']}, left out of the history"})
+                return None
+
+            # --- PRE-QUALIFICATION (local, no LLM) ---
+            passed, score, reasons = prefilter.check(site_data["main_md"], site_data["signals"], final_url)
+            if not passed:
+                prefiltered += 1
+                await finish(lead, "rejected")
+                await self.emit({"type": "log", "message": f"🚫 Prefiltered: {lead['url']} (score {score:.1f}: {', '.join(reasons)})"})
+                await self.emit({"type": "node_error", "node": "3", "lead": lead['url']})
+                return None
+
+            compression = site_data["compression"]
+            await self.emit({"type": "log", "message": (
+                f"Condensed {lead['url']}: Gatekeeper {compression['gatekeeper']['ratio']:.0%}, "
+                f"Hunter {compression['hunter']['ratio']:.0%} of original"
+            )})
+            lead["site_data"] = site_data
+            await self.checkpoint(lead, "scraped")
+            return lead
+
+        # --- GATEKEEPER ---
+        async def gatekeeper_stage(batch):
+            nonlocal qualified_found, gatekeeper_seconds, gatekeeper_leads
+            if qualified_found >= target_count:
+                return [None] * len(batch)
+
+            metrics.bind(lead=batch[0]['url'] if len(batch) == 1 else None)
+            for lead in batch:
+                await self.emit({"type": "node_active", "node": "3", "lead": lead['url']})
+            started = time.perf_counter()
+            analyses = await run_blocking(
+                scout.analyze_business_models,
+                [(lead['url'], lead["site_data"]["business_md"], lead['name'], lead["site_data"]["signals"]) for lead in batch],
+                "gatekeeper" not in cache_bypass,
+                llm_stats
+            )
+            gatekeeper_seconds += time.perf_counter() - started
+            gatekeeper_leads += len(batch)
+
+            passed = []
+            for lead in batch:
+                # A bad answer for one lead must not fail the rest of the batch
+                try:
+                    profile = json.loads(analyses[lead['url']])
+                    if not isinstance(profile, dict):
+                        raise ValueError(f"profile is a {type(profile).__name__}")
+                except (KeyError, TypeError, ValueError) as e:
+                    await report_error("gatekeeper", lead, e)
+                    passed.append(None)
+                    continue
+
+                if not profile.get("is_qualified_business", True):
+                    await finish(lead, "rejected")
+                    await self.emit({"type": "log", "message": f"❌ Rejected: {profile.get('company_name')}"})
+                    await self.emit({"type": "node_error", "node": "3", "lead": lead['url']})
+                    passed.append(None)
+                    continue
+
+                async with claim_lock:
+                    # Another worker may have filled the last slot while we were waiting on the LLM
+                    if qualified_found >= target_count:
+                        passed.append(None)
+                        continue
+
+                    # From here on this call holds a slot: reaching the target must not
+                    # cancel it. The checkpoint is on disk before the slot counts, and
+                    # shielded so a shutdown can't leave the lead checkpointed as "scraped"
+                    pipeline.protect()
+                    lead["profile"] = profile
+                    await asyncio.shield(self.checkpoint(lead, "qualified"))
+                    qualified_found += 1
+                    if qualified_found >= target_count:
+                        target_reached.set()
+                await self.emit({"type": "node_done", "node": "3", "lead": lead['url']})
+                passed.append(lead)
+            return passed
+
+        # --- HUNTER ---
+        async def hunter_stage(lead):
+            metrics.bind(lead=lead['url'])
+            site_data, profile = lead["site_data"], lead["profile"]
+            await self.emit({"type": "node_active", "node": "4", "lead": lead['url']})
+
+            lead["decision_maker"] = await run_blocking(
+                hunter.find_decision_maker,
+                profile['company_name'],
+                site_data["leadership_md"],
+                site_data['found_socials'],
+                "hunter" not in cache_bypass,
+                llm_stats
+            )
+            lead["decision_maker"] = await hunter.validate_profiles(lead["decision_maker"])
+
+            await self.checkpoint(lead, "hunted")
+            await self.emit({"type": "node_done", "node": "4", "lead": lead['url']})
+            return lead
+
+        # --- WRITER ---
+        async def writer_stage(lead):
+            metrics.bind(lead=lead['url'])
+            profile, decision_maker = lead["profile"], lead["decision_maker"]
+            await self.emit({"type": "node_active", "node": "5", "lead": lead['url']})
+
+            on_delta = None
+            sent = []
+            if stream_drafts:
+                loop = asyncio.get_running_loop()
+
+                def send_delta(payload):
+                    sent.append(asyncio.ensure_future(self.emit(payload, replay=False)))
+
+                def stream_delta(field, text):
+                    payload = {"type": "draft_delta", "lead": lead['url'], "field": field, "delta": text}
+                    if field is None:
+                        payload = {"type": "draft_delta", "lead": lead['url'], "reset": True}
+                    loop.call_soon_threadsafe(send_delta, payload)
+                on_delta = stream_delta
+
+            email_json = await run_blocking(
+                drafter.draft_email,
+                profile['company_name'],
+                decision_maker.get('full_name'),
+                profile.get('krykos_automation_hypothesis'),
+                ", ".join(profile.get('operational_pain_points', [])),
+                "writer" not in cache_bypass,
+                llm_stats,
+                on_delta
+            )
+            # Every delta is scheduled by now; let them go out before the final result
+            await asyncio.gather(*sent)
+            try:
+                email_data = json.loads(email_json)
+            except:
+                email_data = {"subject": "Error", "body": email_json}
+
+            await self.emit({"type": "node_done", "node": "5", "lead": lead['url']})
+
+            # FORMAT RESULT
+            result_payload = {
+                "company": profile['company_name'],
+                "person": decision_maker.get('full_name'),
+                "website": lead['url'],
+                "email_subject": email_data.get('subject'),
+                "email_body": email_data.get('body'),
+                "x_url": decision_maker.get('x_url'),
+                "linkedin_url": decision_maker.get('linkedin_url'),
+                "pain_points": profile.get('operational_pain_points', []),
+                "hypothesis": profile.get('krykos_automation_hypothesis')
+            }
+
+            # --- SAVE IMMEDIATELY (one appended row per result) ---
+            result_payload["id"] = await asyncio.to_thread(self.results_store.append, result_payload)
+            await finish({"url": lead['url'], "result_id": result_payload["id"]}, "done")
+
+            # SEND TO UI
+            await self.emit({"type": "result", "data": result_payload})
+            return None
+
+        async def report_error(stage_name, lead, error):
+            print(f"[!] {stage_name} failed for {lead['url']}: {error}")
+            metrics.registry().inc("sdr_pipeline_errors_total", stage=stage_name)
+            await finish(lead, "failed")
+            await self.emit({"type": "log", "message": f"⚠️ {stage_name} failed for {lead['url']}: {error}"})
+
+        def slots(name):
+            return self.scheduler.slots(name, self.id, self.priority)
+
+        pipeline = self.pipeline = Pipeline([
+            Stage("scrape", scrape_stage, workers["scrape"], slots=slots("scrape")),
+            Stage("gatekeeper", gatekeeper_stage, workers["gatekeeper"], batch_size=batch_size, slots=slots("gatekeeper")),
+            Stage("hunter", hunter_stage, workers["hunter"], slots=slots("hunter")),
+            Stage("writer", writer_stage, workers["writer"], slots=slots("writer")),
+        ], on_error=report_error)
+        pipeline.start()
+
+        discovered = len(checkpoints)
+
+        # Discovery streams leads into the Scout while later search rounds are still running
+        async def feed():
+            nonlocal discovered
+            # Checkpointed leads first, each re-entering after its last completed stage
+            for url, stage, lead in checkpoints:
+                if stage in TERMINAL_STAGES:
+                    continue
+                if stage in ("discovered", "scraped") and qualified_found >= target_count:
+                    continue
+                if not await pipeline.submit(lead, RESUME_STAGE[stage]):
+                    return
+
+            if qualified_found < target_count:
+                async for lead in discoverer.stream_companies(niche):
+                    if lead['url'] in known_urls or lead['domain'] in claimed:
+                        continue
+                    known_urls.add(lead['url'])
+                    claimed.add(lead['domain'])
+                    discovered += 1
+                    await self.checkpoint(lead, "discovered")
+                    if not await pipeline.submit(lead):
+                        break
+            await self.emit({"type": "node_done", "node": "1"})
+
+        feed_task = asyncio.create_task(feed())
+
+        async def feed_and_drain():
+            await asyncio.wait({feed_task})
+            await pipeline.join()
+
+        async def report_stats():
+            while True:
+                await asyncio.sleep(STATS_INTERVAL)
+                await self.emit({"type": "pipeline_stats", "data": pipeline.stats()})
+
+        drain_task = asyncio.create_task(feed_and_drain())
+        reached_task = asyncio.create_task(target_reached.wait())
+        stats_task = asyncio.create_task(report_stats())
+        try:
+            await asyncio.wait({drain_task, reached_task}, return_when=asyncio.FIRST_COMPLETED)
+            if target_reached.is_set():
+                # Leads in front of the Hunter are dropped and their work cancelled;
+                # Gatekeeper calls holding a claimed slot finish and pass it on
+                pipeline.close_before("hunter")
+                feed_task.cancel()
+            await drain_task
+        finally:
+            for task in (feed_task, drain_task, reached_task, stats_task):
+                task.cancel()
+            await pipeline.stop()
+            if metric_listener:
+                metrics.registry().unsubscribe(metric_listener)
+
+        if feed_task.done() and not feed_task.cancelled() and feed_task.exception():
+            raise feed_task.exception()
+        if not discovered:
+            await self.emit({"type": "error", "message": "No leads found."})
+            return
+
+        await self.emit({"type": "pipeline_stats", "data": pipeline.stats()})
+        cache_stats = scout.scrape_cache.stats()
+        await self.emit({"type": "log", "message": f"Scrape cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses"})
+        if prefiltered:
+            # Estimated from this campaign's average Gatekeeper time per lead
+            saved = prefiltered * (gatekeeper_seconds / gatekeeper_leads if gatekeeper_leads else 0.0)
+            await self.emit({"type": "log", "message": f"Prefilter: {prefiltered} leads rejected before the LLM (~{saved:.0f}s of Gatekeeper time saved)"})
+        llm_usage = llm_stats.as_dict()
+        await self.emit({"type": "log", "message": f"LLM cache: {llm_usage['cache_hits']}/{llm_usage['calls']} calls served, {llm_usage['tokens_saved']} tokens saved"})
+        await self.emit({"type": "log", "message": "🏁 Mission Complete."})
+
+
+class JobManager:
+    """Starts, tracks and resumes the campaigns running in this process."""
+    def __init__(self, results_store, store=None, scheduler=None):
+        self.results_store = results_store
+        self.store = store or CampaignStore()
+        self.scheduler = scheduler or Scheduler()
+        self.jobs = {}
+
+    def start(self, config, campaign_id=None, resume=False):
+        if campaign_id is None:
+            campaign_id = uuid.uuid4().hex
+            self.store.create(campaign_id, config)
+        job = CampaignJob(campaign_id, config, self.store, self.results_store, self.scheduler)
+        self.jobs[campaign_id] = job
+        job.task = asyncio.create_task(job.run(resume=resume))
+        job.task.add_done_callback(lambda _: self.jobs.pop(campaign_id, None))
+        return job
+
+    def get(self, campaign_id):
+        return self.jobs.get(campaign_id)
+
+    def resume_all(self):
+        """Restarts every campaign a previous process left unfinished."""
+        for campaign in self.store.unfinished():
+            if campaign["id"] not in self.jobs:
+                print(f"[*] Resuming campaign {campaign['id']} ({campaign['niche']})")
+                self.start(campaign["config"], campaign_id=campaign["id"], resume=True)
+
+    async def shutdown(self):
+        tasks = [job.task for job in self.jobs.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.scheduler.close()
+
+    def pipeline_stats(self):
+        return {campaign_id: job.pipeline.stats() for campaign_id, job in list(self.jobs.items()) if job.pipeline}
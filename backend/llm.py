@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import time
+from openai import OpenAI
+from dotenv import load_dotenv
+
+from cache import DiskCache, content_key
+from metrics import registry
+from ratelimit import limited
+
+load_dotenv()
+
+LLM_CACHE_FILE = os.getenv("LLM_CACHE_FILE", "llm_cache.db")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL_HOURS", "720")) * 3600
+LLM_CACHE_MAX_BYTES = int(float(os.getenv("LLM_CACHE_MAX_MB", "200")) * 1024 * 1024)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def completion_cache():
+    """One completion cache per process, shared by the Gatekeeper, Hunter and Writer."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DiskCache(LLM_CACHE_FILE, ttl=LLM_CACHE_TTL, max_bytes=LLM_CACHE_MAX_BYTES)
+        return _cache
+
+
+def json_object(content):
+    """Default answer check for response_format json_object: the content parses to a JSON object."""
+    return isinstance(json.loads(content), dict)
+
+
+def _accepted(validate, content):
+    try:
+        return bool(validate(content))
+    except Exception:
+        return False
+
+
+class UsageStats:
+    """LLM counters for one campaign."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.cache_hits = 0
+        self.tokens_used = 0
+        self.tokens_saved = 0
+
+    def record(self, tokens, cached):
+        with self.lock:
+            self.calls += 1
+            if cached:
+                self.cache_hits += 1
+                self.tokens_saved += tokens
+            else:
+                self.tokens_used += tokens
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "cache_hits": self.cache_hits,
+            "tokens_used": self.tokens_used,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+class LLMClient:
+    """
+    Thin wrapper over an OpenAI-compatible chat endpoint that serves repeated
+    prompts from the completion cache. The key covers everything that shapes the
+    answer: model, messages, temperature and response_format.
+    """
+    def __init__(self, api_key, base_url, model, backend, cache=None):
+        self.ai = OpenAI(api_key=api_key, base_url=base_url)
+        self.model = model
+        self.backend = backend  # Rate-limit bucket: "ollama" or "deepseek"
+        self.cache = cache or completion_cache()
+
+    def complete(self, messages, temperature=None, response_format=None, use_cache=True, stats=None, on_delta=None,
+                 validate=None):
+        """
+        Returns the message content. With use_cache=False the cache is not read,
+        but the fresh answer still replaces the stored one. With `on_delta` the
+        completion is streamed and every content chunk is passed to it as it
+        arrives (a cached answer arrives as one chunk).
+
+        Only answers `validate(content)` accepts are cached, so a truncated or
+        malformed one isn't served again for the whole TTL. JSON requests
+        default to "parses to an object"; a stored answer that fails the check
+        is evicted.
+        """
+        if validate is None and (response_format or {}).get("type") == "json_object":
+            validate = json_object
+        key = content_key("chat", self.model, messages, temperature, response_format)
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None and validate and not _accepted(validate, cached["content"]):
+                self.cache.delete(key)
+                cached = None
+            if cached is not None:
+                if stats:
+                    stats.record(cached.get("tokens", 0), cached=True)
+                registry().record_llm(self.backend, 0.0, cached.get("prompt_tokens", cached.get("tokens", 0)),
+                                      cached.get("completion_tokens", 0), cached=True)
+                if on_delta:
+                    on_delta(cached["content"])
+                return cached["content"]
+
+        params = {"model": self.model, "messages": messages}
+        if temperature is not None:
+            params["temperature"] = temperature
+        if response_format is not None:
+            params["response_format"] = response_format
+
+        started = time.perf_counter()
+        if on_delta:
+            content, usage = self._stream(params, on_delta, started)
+        else:
+            response = limited(self.backend, self.ai.chat.completions.create, **params)
+            content = response.choices[0].message.content
+            usage = getattr(response, "usage", None)
+        tokens = usage.total_tokens if usage else 0
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        registry().record_llm(self.backend, time.perf_counter() - started, prompt_tokens, completion_tokens, cached=False)
+        if stats:
+            stats.record(tokens, cached=False)
+        if content and (validate is None or _accepted(validate, content)):
+            self.cache.set(key, {"content": content, "tokens": tokens,
+                                 "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens})
+        return content
+
+    def _stream(self, params, on_delta, started):
+        """Streams one completion. Only opening the stream counts against the rate limit."""
+        stream = limited(self.backend, self.ai.chat.completions.create, stream=True,
+                         stream_options={"include_usage": True}, **params)
+        parts = []
+        usage = None
+        with stream:
+            for chunk in stream:
+                # The last chunk carries the usage and no choices
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if not parts:
+                        registry().observe("sdr_llm_first_token_seconds", time.perf_counter() - started, backend=self.backend)
+                    parts.append(delta)
+                    on_delta(delta)
+        return "".join(parts), usage
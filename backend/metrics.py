@@ -0,0 +1,255 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# USD per 1M tokens as "input/output". Override with LLM_PRICE_<BACKEND>, e.g. LLM_PRICE_DEEPSEEK=0.27/1.10
+DEFAULT_PRICES = {
+    "deepseek": "0.27/1.10",
+    "ollama": "0/0",
+}
+
+# Campaign and lead the current task or thread is working on (asyncio.to_thread copies it along)
+_labels = contextvars.ContextVar("metric_labels", default={})
+_span = contextvars.ContextVar("metric_span", default=None)
+
+
+def price(backend):
+    spec = os.getenv(f"LLM_PRICE_{backend.upper()}", DEFAULT_PRICES.get(backend, "0/0"))
+    prompt, _, completion = spec.partition("/")
+    return float(prompt), float(completion or prompt)
+
+
+def bind(**labels):
+    """Tags every span started from here on (in this task and the threads it starts), e.g. bind(campaign=id, lead=url)."""
+    _labels.set({**_labels.get(), **labels})
+
+
+class Span:
+    def __init__(self, stage, labels):
+        self.stage = stage
+        self.labels = labels
+        self.error = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_calls = 0
+
+    def fail(self, error):
+        """Marks the span as failed when the error is handled inside it instead of raised."""
+        self.error = str(error) or type(error).__name__
+
+
+class Metrics:
+    """
+    Process-wide counters and latency histograms, rendered in the Prometheus
+    text format. Listeners get every finished span as a dict, which is how
+    campaigns forward them to the UI as "metric" events.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}    # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+        self.listeners = []
+        self.collectors = []
+
+    def add_collector(self, collect):
+        """`collect()` returns [(name, type, labels, value)], read on every render (e.g. the rate limit buckets)."""
+        with self.lock:
+            self.collectors.append(collect)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            hist = self.histograms.setdefault(key, [0] * (len(BUCKETS) + 2))
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    hist[i] += 1
+            hist[-2] += seconds
+            hist[-1] += 1
+
+    @contextmanager
+    def span(self, stage):
+        """Times one unit of work of a stage, with the tokens its LLM calls used."""
+        span = Span(stage, _labels.get())
+        token = _span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.fail(e)
+            raise
+        finally:
+            _span.reset(token)
+            seconds = time.perf_counter() - started
+            self.observe("sdr_stage_seconds", seconds, stage=stage)
+            if span.error:
+                self.inc("sdr_stage_errors_total", stage=stage)
+            self._publish({
+                "type": "metric",
+                "stage": stage,
+                "seconds": round(seconds, 4),
+                "ok": span.error is None,
+                "error": span.error,
+                "prompt_tokens": span.prompt_tokens,
+                "completion_tokens": span.completion_tokens,
+                "cached_calls": span.cached_calls,
+                **span.labels,
+            })
+
+    def total(self, name):
+        """A counter summed over all its labels."""
+        with self.lock:
+            return sum(value for (counter, _), value in self.counters.items() if counter == name)
+
+    def record_llm(self, backend, seconds, prompt_tokens, completion_tokens, cached):
+        """One completion: tokens, cost and latency per backend, also charged to the open span."""
+        self.inc("sdr_llm_calls_total", backend=backend, cached="true" if cached else "false")
+        if cached:
+            self.inc("sdr_llm_tokens_saved_total", prompt_tokens + completion_tokens, backend=backend)
+        else:
+            self.observe("sdr_llm_request_seconds", seconds, backend=backend)
+            self.inc("sdr_llm_tokens_total", prompt_tokens, backend=backend, type="prompt")
+            self.inc("sdr_llm_tokens_total", completion_tokens, backend=backend, type="completion")
+            prompt_price, completion_price = price(backend)
+            cost = (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+            if cost:
+                self.inc("sdr_llm_cost_usd_total", cost, backend=backend)
+
+        span = _span.get()
+        if span:
+            if cached:
+                span.cached_calls += 1
+            else:
+                span.prompt_tokens += prompt_tokens
+                span.completion_tokens += completion_tokens
+
+    def record_cache(self, cache, hit):
+        self.inc("sdr_cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+    def subscribe(self, listener):
+        """`listener(event)` is called from whichever thread finished the span."""
+        with self.lock:
+            self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        with self.lock:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+
+    def _publish(self, event):
+        with self.lock:
+            listeners = list(self.listeners)
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"[!] Metrics listener failed: {e}")
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {key: list(hist) for key, hist in self.histograms.items()}
+
+        lines = []
+        typed = set()
+        for (name, labels), value in sorted(counters.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_labels_text(labels)} {_number(value)}")
+
+        # Hit ratio per cache, derived from the request counters
+        caches = {}
+        for (name, labels), value in counters.items():
+            if name == "sdr_cache_requests_total":
+                label_map = dict(labels)
+                hits_total = caches.setdefault(label_map["cache"], [0, 0])
+                hits_total[0] += value if label_map["result"] == "hit" else 0
+                hits_total[1] += value
+        if caches:
+            lines.append("# TYPE sdr_cache_hit_ratio gauge")
+            for cache, (hits, total) in sorted(caches.items()):
+                lines.append(f'sdr_cache_hit_ratio{{cache="{cache}"}} {_number(hits / total if total else 0)}')
+
+        for collect in list(self.collectors):
+            try:
+                samples = collect()
+            except Exception as e:
+                print(f"[!] Metrics collector failed: {e}")
+                continue
+            for name, kind, labels, value in samples:
+                if name not in typed:
+                    lines.append(f"# TYPE {name} {kind}")
+                    typed.add(name)
+                lines.append(f"{name}{_labels_text(tuple(sorted(labels.items())))} {_number(value)}")
+
+        for (name, labels), hist in sorted(histograms.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            for bound, count in zip(BUCKETS, hist):
+                lines.append(f"{name}_bucket{_labels_text(labels + (('le', _number(bound)),))} {count}")
+            lines.append(f"{name}_bucket{_labels_text(labels + (('le', '+Inf'),))} {hist[-1]}")
+            lines.append(f"{name}_sum{_labels_text(labels)} {_number(hist[-2])}")
+            lines.append(f"{name}_count{_labels_text(labels)} {hist[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels_text(labels):
+    if not labels:
+        return ""
+    escaped = (f'{k}="{_escape(v)}"' for k, v in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    return repr(round(value, 6)) if isinstance(value, float) else str(value)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def registry():
+    """The process-wide metrics registry."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = Metrics()
+        return _registry
+
+
+def span(stage):
+    return registry().span(stage)
+
+
+def timed(stage):
+    """Decorator version of span()."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def fail(error):
+    """Marks the innermost open span as failed, for errors that are handled instead of raised."""
+    current = _span.get()
+    if current:
+        current.fail(error)
@@ -0,0 +1,185 @@
+import asyncio
+import time
+
+
+class Stage:
+    """
+    One step of the lead pipeline with its own worker pool.
+    The queue in front of it is bounded, so a slow stage pushes back on the ones before it.
+    """
+    def __init__(self, name, handler, workers=1, queue_size=None, batch_size=None, batch_wait=0.5, slots=None):
+        self.name = name
+        # async fn(item) -> item for the next stage, or None to drop it.
+        # With batch_size set, the handler gets a list and returns a list of the same length.
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.batch_size = max(1, int(batch_size)) if batch_size else None
+        self.batch_wait = batch_wait  # How long a worker waits for a batch to fill up
+        # Optional capacity shared with other pipelines: acquire() before each handler call, release() after
+        self.slots = slots
+        self.queue = asyncio.Queue(maxsize=queue_size or self.workers * max(2, self.batch_size or 1))
+        self.closed = False
+        self.running = set()
+
+        # Counters for observability
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "active": len(self.running),
+            "queue_depth": self.queue.qsize(),
+            "batch_size": self.batch_size or 1,
+            "processed": self.processed,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "closed": self.closed,
+        }
+
+
+class Pipeline:
+    """
+    Chains Stages with queues. Items enter the first stage via submit() and move
+    forward whenever a handler returns something other than None.
+    """
+    def __init__(self, stages, on_error=None):
+        self.stages = stages
+        self.on_error = on_error  # async fn(stage_name, item, exception)
+        self._workers = []
+        self._protected = set()
+        self.started_at = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        for index, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                self._workers.append(asyncio.create_task(self._worker(index)))
+
+    async def submit(self, item, stage=None):
+        """Queues an item (blocks while the stage is full). Returns False once the stage is closed."""
+        target = self._stage(stage) if stage else self.stages[0]
+        if target.closed:
+            return False
+        await target.queue.put(item)
+        return True
+
+    async def join(self):
+        """Waits until every submitted item has left the pipeline."""
+        for stage in self.stages:
+            await stage.queue.join()
+
+    def close_before(self, stage_name):
+        """
+        Stops all stages in front of `stage_name`: queued items are skipped and
+        in-flight handler calls are cancelled, except those that called protect().
+        Later stages keep draining.
+        """
+        for stage in self.stages:
+            if stage.name == stage_name:
+                break
+            stage.closed = True
+            for task in stage.running - self._protected:
+                task.cancel()
+
+    def protect(self):
+        """
+        Called from inside a handler: close_before() lets this call finish and
+        pass its items on, e.g. once it holds a lead that claimed a target slot.
+        """
+        self._protected.add(asyncio.current_task())
+
+    async def stop(self):
+        for stage in self.stages:
+            stage.closed = True
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0.0
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "stages": {stage.name: stage.stats() for stage in self.stages},
+        }
+
+    def _stage(self, name):
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        raise KeyError(name)
+
+    async def _next_batch(self, stage):
+        """Takes one item, then keeps taking until the batch is full or batch_wait runs out."""
+        items = [await stage.queue.get()]
+        if not stage.batch_size:
+            return items
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + stage.batch_wait
+        while len(items) < stage.batch_size:
+            if not stage.queue.empty():
+                items.append(stage.queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(stage.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return items
+
+    async def _worker(self, index):
+        stage = self.stages[index]
+        next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+
+        while True:
+            items = await self._next_batch(stage)
+            try:
+                if stage.closed:
+                    continue
+
+                if stage.slots:
+                    await stage.slots.acquire()
+                    if stage.closed:
+                        stage.slots.release()
+                        continue
+
+                # Run the handler as its own task so close_before() can cancel
+                # the call without killing this worker.
+                task = asyncio.create_task(stage.handler(items if stage.batch_size else items[0]))
+                stage.running.add(task)
+                started = time.perf_counter()
+                try:
+                    await asyncio.wait({task})
+                except asyncio.CancelledError:
+                    task.cancel()
+                    raise
+                finally:
+                    stage.running.discard(task)
+                    self._protected.discard(task)
+                    stage.busy_seconds += time.perf_counter() - started
+                    if stage.slots:
+                        stage.slots.release()
+
+                if task.cancelled():
+                    continue
+
+                stage.processed += len(items)
+                if task.exception():
+                    stage.failed += len(items)
+                    if self.on_error:
+                        for item in items:
+                            await self.on_error(stage.name, item, task.exception())
+                    continue
+
+                results = task.result() if stage.batch_size else [task.result()]
+                for result in results:
+                    if result is not None and next_stage is not None:
+                        await next_stage.queue.put(result)
+            finally:
+                for _ in items:
+                    stage.queue.task_done()
@@ -0,0 +1,93 @@
+import os
+import re
+
+from blacklist import shared_blacklist
+
+# Lower scores look less like a real business. Leads below the threshold never reach the Gatekeeper LLM.
+PREFILTER_THRESHOLD = float(os.getenv("PREFILTER_THRESHOLD", "-1.0"))
+
+PARKED_PHRASES = [
+    'domain is for sale', 'this domain may be for sale', 'buy this domain', 'domain for sale',
+    'parked free', 'parkingcrew', 'sedoparking', 'hugedomains', 'dan.com', 'is parked',
+]
+DIRECTORY_PHRASES = [
+    'top 10', 'top 20', 'top 25', 'best agencies', 'best companies', 'compare agencies',
+    'listings', 'write a review', 'read reviews', 'claim this listing', 'sponsored', 'ranked',
+]
+EMPTY_APP_PHRASES = [
+    'enable javascript', 'javascript is required', 'you need to enable javascript', 'loading...',
+]
+BUSINESS_CUES = [
+    'our services', 'our team', 'about us', 'our clients', 'case studies', 'contact us',
+    'get a quote', 'free consultation', 'our work', 'testimonials',
+]
+
+MARKDOWN_LINK = re.compile(r'\[([^\]]*)\]\(([^)]*)\)')
+
+
+class LeadPrefilter:
+    """
+    Cheap local scoring that runs before the Gatekeeper LLM and drops obvious
+    non-businesses: parked domains, directories that slipped past discovery, empty SPAs.
+    """
+    def __init__(self, threshold=PREFILTER_THRESHOLD, blacklist=None):
+        self.threshold = threshold
+        self.blacklist = blacklist or shared_blacklist()
+
+    def score(self, markdown, signals, url=None):
+        """
+        Returns (score, reasons). `signals` comes from SDRScout._detect_technical_signals,
+        `url` is where the scrape ended up.
+        """
+        markdown = markdown or ""
+        md_lower = markdown.lower()
+        length = len(markdown)
+        score = 0.0
+        reasons = []
+
+        # Discovery only screened the search hit; the site may redirect into a
+        # directory, or the blacklist may have been reloaded since
+        hit = self.blacklist.screen(url) if url else None
+        if hit:
+            score -= 3.0
+            reasons.append(f"blacklisted {hit}")
+
+        # Friction signals are exactly what the Gatekeeper sells against
+        score += len(signals)
+
+        cues = sum(1 for c in BUSINESS_CUES if c in md_lower)
+        score += min(cues * 0.5, 2.0)
+
+        if any(p in md_lower for p in PARKED_PHRASES):
+            score -= 3.0
+            reasons.append("parked domain")
+
+        directory_hits = sum(1 for p in DIRECTORY_PHRASES if p in md_lower)
+        if directory_hits >= 2:
+            score -= 2.0
+            reasons.append(f"directory phrases ({directory_hits})")
+
+        if length < 400:
+            score -= 2.0
+            reasons.append(f"tiny page ({length} chars)")
+        elif length < 1000:
+            score -= 1.0
+
+        if any(p in md_lower for p in EMPTY_APP_PHRASES) and length < 1500:
+            score -= 3.0
+            reasons.append("empty app shell")
+
+        # Share of the page that is link markup. Directories and link farms are mostly links.
+        link_chars = sum(len(m.group(0)) for m in MARKDOWN_LINK.finditer(markdown))
+        link_density = link_chars / length if length else 1.0
+        if link_density > 0.6:
+            score -= 2.0
+            reasons.append(f"link density {link_density:.0%}")
+
+        return score, reasons
+
+    def check(self, markdown, signals, url=None):
+        """Returns (passed, score, reasons). A threshold of None disables the filter."""
+        score, reasons = self.score(markdown, signals, url)
+        passed = self.threshold is None or score >= self.threshold
+        return passed, score, reasons
@@ -0,0 +1,186 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+# Default budgets per backend as "requests per second/burst". Override with RATE_LIMIT_<BACKEND>, e.g. RATE_LIMIT_DDGS=0.5/2
+DEFAULT_LIMITS = {
+    "ddgs": "0.5/2",
+    "firecrawl": "5/10",
+    "ollama": "20/20",
+    "deepseek": "10/20",
+}
+MAX_BACKOFF = float(os.getenv("RATE_LIMIT_MAX_BACKOFF", "60"))
+RETRIES_ON_THROTTLE = 2
+# Threads for blocking backend calls (see run_blocking)
+BACKEND_THREADS = int(os.getenv("BACKEND_THREADS", "64"))
+
+
+def is_rate_limit_error(error):
+    """429s and the various RateLimit exceptions of the OpenAI, DDGS and Firecrawl clients."""
+    text = f"{type(error).__name__} {error}".lower()
+    return "429" in text or "ratelimit" in text or "rate limit" in text or "too many requests" in text
+
+
+class TokenBucket:
+    """
+    Classic token bucket with adaptive backoff. Calls go through immediately
+    while tokens are left; when a backend pushes back (429), the bucket pauses
+    with an exponential backoff that decays again on success.
+    """
+    def __init__(self, name, rate, burst):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.backoff = 0.0
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+        # Counters for metrics
+        self.calls = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.last_wait = 0.0
+        self.waiting = 0
+
+    def _reserve(self):
+        """Takes a token (possibly on credit) and returns how long the caller must wait for it."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = max(-self.tokens / self.rate if self.tokens < 0 else 0.0, self.paused_until - now)
+            self.calls += 1
+            self.total_wait += wait
+            self.last_wait = wait
+            return wait
+
+    def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            with self.lock:
+                self.waiting += 1
+            try:
+                time.sleep(wait)
+            finally:
+                with self.lock:
+                    self.waiting -= 1
+
+    def report_throttled(self):
+        with self.lock:
+            self.throttled += 1
+            self.backoff = min(max(self.backoff * 2, 1.0), MAX_BACKOFF)
+            self.paused_until = max(self.paused_until, time.monotonic() + self.backoff)
+            self.tokens = min(self.tokens, 0.0)
+
+    def report_success(self):
+        with self.lock:
+            if self.backoff:
+                self.backoff = self.backoff / 2 if self.backoff > 1.0 else 0.0
+
+    def current_wait(self):
+        """Seconds a call made right now would wait."""
+        with self.lock:
+            now = time.monotonic()
+            tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            return max((1 - tokens) / self.rate if tokens < 1 else 0.0, self.paused_until - now, 0.0)
+
+    def stats(self):
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "current_wait_seconds": round(self.current_wait(), 3),
+            "backoff_seconds": self.backoff,
+            "waiting": self.waiting,
+            "calls": self.calls,
+            "throttled": self.throttled,
+            "total_wait_seconds": round(self.total_wait, 3),
+            "last_wait_seconds": round(self.last_wait, 3),
+        }
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def limiter(backend):
+    """The process-wide bucket for a backend, created from env/defaults on first use."""
+    with _buckets_lock:
+        if backend not in _buckets:
+            spec = os.getenv(f"RATE_LIMIT_{backend.upper()}", DEFAULT_LIMITS.get(backend, "10/10"))
+            rate, _, burst = spec.partition("/")
+            _buckets[backend] = TokenBucket(backend, float(rate), float(burst or rate))
+        return _buckets[backend]
+
+
+def limited(backend, fn, *args, **kwargs):
+    """Runs a blocking call under the backend's budget, backing off and retrying on rate-limit errors."""
+    bucket = limiter(backend)
+    for attempt in range(RETRIES_ON_THROTTLE + 1):
+        bucket.acquire()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if is_rate_limit_error(e):
+                bucket.report_throttled()
+                print(f"[!] {backend}: rate limited, backing off {bucket.backoff:.0f}s")
+                if attempt < RETRIES_ON_THROTTLE:
+                    continue
+            raise
+        bucket.report_success()
+        return result
+
+
+def all_stats():
+    with _buckets_lock:
+        buckets = list(_buckets.values())
+    return {b.name: b.stats() for b in buckets}
+
+
+def _collect():
+    """The bucket stats as metrics for /api/metrics."""
+    samples = []
+    for backend, stats in all_stats().items():
+        labels = {"backend": backend}
+        samples += [
+            ("sdr_ratelimit_wait_seconds", "gauge", labels, stats["current_wait_seconds"]),
+            ("sdr_ratelimit_backoff_seconds", "gauge", labels, stats["backoff_seconds"]),
+            ("sdr_ratelimit_waiting", "gauge", labels, stats["waiting"]),
+            ("sdr_ratelimit_calls_total", "counter", labels, stats["calls"]),
+            ("sdr_ratelimit_throttled_total", "counter", labels, stats["throttled"]),
+            ("sdr_ratelimit_wait_seconds_total", "counter", labels, stats["total_wait_seconds"]),
+        ]
+    return samples
+
+
+metrics.registry().add_collector(_collect)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def backend_executor():
+    """
+    The process-wide threads for calls that go through limited(). They may sleep
+    on a bucket, so they stay off the default executor that SQLite and the caches use.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=BACKEND_THREADS, thread_name_prefix="backend")
+        return _executor
+
+
+async def run_blocking(fn, *args):
+    """asyncio.to_thread() on the backend executor, for calls that may wait on a rate limit."""
+    context = contextvars.copy_context()  # Metric labels follow the call, as with to_thread
+    return await asyncio.get_running_loop().run_in_executor(backend_executor(), functools.partial(context.run, fn, *args))
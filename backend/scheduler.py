@@ -0,0 +1,205 @@
+import asyncio
+import itertools
+import os
+
+from discoverer import LeadDiscoverer
+from scout import SDRScout
+from identity import IdentityHunter
+from writer import EmailDrafter
+from database import HistoryDB
+import textproc
+
+# Campaigns that run at the same time; the rest wait in line
+MAX_ACTIVE_CAMPAIGNS = int(os.getenv("MAX_ACTIVE_CAMPAIGNS", "3"))
+# Handler calls in flight per stage, across all campaigns. Each stage talks to a
+# different backend, so the slowest one (the local Ollama box, ~2 parallel
+# requests) sets throughput without idling the rest.
+STAGE_CAPACITY = {
+    "scrape": int(os.getenv("SCRAPE_WORKERS", "4")),          # Firecrawl
+    "gatekeeper": int(os.getenv("GATEKEEPER_WORKERS", "2")),  # Ollama
+    "hunter": int(os.getenv("HUNTER_WORKERS", "2")),          # Ollama + DDGS
+    "writer": int(os.getenv("WRITER_WORKERS", "6")),          # DeepSeek
+}
+
+
+class FairShare:
+    """
+    A stage's worker slots, shared by every running campaign. When slots are
+    scarce the next one goes to the waiting campaign holding the fewest slots
+    relative to its priority, so a big campaign can't starve a small one, but
+    a campaign running alone still gets all of them.
+    """
+    def __init__(self, name, capacity):
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.in_use = {}
+        self.weights = {}
+        self.total = 0
+        self.waiters = []  # (campaign_id, ticket, future), ticket keeps FIFO order within a campaign
+        self.tickets = itertools.count()
+
+    def handle(self, campaign_id, priority=1):
+        """The acquire()/release() pair a campaign's Stage uses."""
+        self.weights[campaign_id] = max(1, priority)
+        return _Slots(self, campaign_id)
+
+    def forget(self, campaign_id):
+        self.weights.pop(campaign_id, None)
+        if not self.in_use.get(campaign_id):
+            self.in_use.pop(campaign_id, None)
+
+    async def acquire(self, campaign_id):
+        if self.total < self.capacity and not self.waiters:
+            self._grant(campaign_id)
+            return
+        future = asyncio.get_running_loop().create_future()
+        entry = (campaign_id, next(self.tickets), future)
+        self.waiters.append(entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if entry in self.waiters:
+                self.waiters.remove(entry)
+            elif future.done() and not future.cancelled():
+                self.release(campaign_id)  # Granted just as we were cancelled, hand it on
+            raise
+
+    def release(self, campaign_id):
+        self.total -= 1
+        self.in_use[campaign_id] -= 1
+        self._wake()
+
+    def _grant(self, campaign_id):
+        self.total += 1
+        self.in_use[campaign_id] = self.in_use.get(campaign_id, 0) + 1
+
+    def _wake(self):
+        while self.total < self.capacity and self.waiters:
+            entry = min(self.waiters, key=lambda w: (self.in_use.get(w[0], 0) / self.weights.get(w[0], 1), w[1]))
+            self.waiters.remove(entry)
+            campaign_id, _, future = entry
+            if future.cancelled():
+                continue
+            self._grant(campaign_id)
+            future.set_result(None)
+
+    def stats(self):
+        return {
+            "capacity": self.capacity,
+            "in_use": self.total,
+            "waiting": len(self.waiters),
+            "by_campaign": {c: n for c, n in self.in_use.items() if n},
+        }
+
+
+class _Slots:
+    def __init__(self, share, campaign_id):
+        self.share = share
+        self.campaign_id = campaign_id
+
+    async def acquire(self):
+        await self.share.acquire(self.campaign_id)
+
+    def release(self):
+        self.share.release(self.campaign_id)
+
+
+class Scheduler:
+    """
+    Central coordinator for all campaigns in the process: one set of agents
+    and backend clients, per-stage worker slots shared fairly between the
+    running campaigns, and a line for campaigns beyond MAX_ACTIVE_CAMPAIGNS
+    (higher priority first, then first come first served).
+    """
+    def __init__(self, max_active=MAX_ACTIVE_CAMPAIGNS, capacity=None):
+        self.max_active = max(1, max_active)
+        self.stages = {name: FairShare(name, n) for name, n in {**STAGE_CAPACITY, **(capacity or {})}.items()}
+        self.active = set()
+        self.pending = []  # (-priority, ticket, campaign_id, future, on_position)
+        self.tickets = itertools.count()
+        self._agents = None
+
+    @property
+    def agents(self):
+        """Discoverer, Scout, Hunter, Writer and history, created once and shared by every campaign."""
+        if self._agents is None:
+            self._agents = {
+                "discoverer": LeadDiscoverer(),
+                "scout": SDRScout(),
+                "hunter": IdentityHunter(),
+                "drafter": EmailDrafter(),
+                "db": HistoryDB(),
+            }
+        return self._agents
+
+    def slots(self, stage_name, campaign_id, priority=1):
+        return self.stages[stage_name].handle(campaign_id, priority)
+
+    async def admit(self, campaign_id, priority=1, on_position=None):
+        """
+        Waits until the campaign may run. `on_position(n)` is awaited with its
+        place in line (1 = next) whenever that changes while it waits.
+        """
+        if len(self.active) < self.max_active and not self.pending:
+            self.active.add(campaign_id)
+            return
+        future = asyncio.get_running_loop().create_future()
+        entry = (-priority, next(self.tickets), campaign_id, future, on_position)
+        self.pending.append(entry)
+        self.pending.sort(key=lambda e: e[:2])
+        await self._announce()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if entry in self.pending:
+                self.pending.remove(entry)
+                await self._announce()
+            elif future.done() and not future.cancelled():
+                await self.leave(campaign_id)
+            raise
+
+    async def leave(self, campaign_id):
+        """Frees the campaign's place and lets the next one in."""
+        self.active.discard(campaign_id)
+        for share in self.stages.values():
+            share.forget(campaign_id)
+        moved = False
+        while len(self.active) < self.max_active and self.pending:
+            _, _, next_id, future, _ = self.pending.pop(0)
+            if future.cancelled():
+                continue
+            self.active.add(next_id)
+            future.set_result(None)
+            moved = True
+        if moved:
+            await self._announce()
+
+    def position(self, campaign_id):
+        """0 while running, n for the n-th in line, None if unknown."""
+        if campaign_id in self.active:
+            return 0
+        for index, entry in enumerate(self.pending):
+            if entry[2] == campaign_id:
+                return index + 1
+        return None
+
+    async def _announce(self):
+        for index, (_, _, _, _, on_position) in enumerate(list(self.pending)):
+            if on_position:
+                try:
+                    await on_position(index + 1)
+                except Exception as e:
+                    print(f"[!] Scheduler: could not report queue position: {e}")
+
+    async def close(self):
+        if self._agents:
+            await self._agents["hunter"].validator.aclose()
+        textproc.shutdown()
+
+    def stats(self):
+        return {
+            "max_active": self.max_active,
+            "active": sorted(self.active),
+            "pending": [entry[2] for entry in self.pending],
+            "stages": {name: share.stats() for name, share in self.stages.items()},
+        }
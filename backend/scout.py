@@ -1,91 +1,151 @@
 import json
-import os, re
+import os
 from firecrawl import FirecrawlApp
-from openai import OpenAI
 from dotenv import load_dotenv
 
+from cache import DiskCache, content_key, normalize_url
+from llm import LLMClient
+import metrics
+from ratelimit import limited
+import textproc
+
 load_dotenv()
 
+SCRAPE_CACHE_FILE = os.getenv("SCRAPE_CACHE_FILE", "scrape_cache.db")
+SCRAPE_CACHE_TTL = float(os.getenv("SCRAPE_CACHE_TTL_HOURS", "168")) * 3600
+SCRAPE_CACHE_MAX_BYTES = int(float(os.getenv("SCRAPE_CACHE_MAX_MB", "500")) * 1024 * 1024)
+
+# Prompt budgets for the condensed page text
+GATEKEEPER_TOKEN_BUDGET = int(os.getenv("GATEKEEPER_TOKEN_BUDGET", "1250"))
+HUNTER_TOKEN_BUDGET = int(os.getenv("HUNTER_TOKEN_BUDGET", "1000"))
+
+# Per-lead content budget in batch mode, so several sites fit in one context window
+BATCH_CONTENT_CHARS = int(os.getenv("GATEKEEPER_BATCH_CONTENT_CHARS", "2500"))
+
+# Shared instructions for batched qualification. Kept static so the prompt prefix is identical across requests.
+BATCH_SYSTEM_PROMPT = """
+    You are an Operations Audit Bot. You will receive several company websites, each marked with
+    "### LEAD <id>", its TECHNICAL SIGNALS and its CONTENT. For EACH lead, find ONE high-friction
+    manual process to sell automation against.
+
+    INSTRUCTIONS (apply per lead, using that lead's own signals):
+    1. If "Has Generic Contact Form" is detected -> Your Pain Point MUST be "Manual data entry from contact forms into CRM".
+    2. If "Manual Scheduling Friction" is detected -> Your Pain Point MUST be "Back-and-forth email tagging to book meetings".
+    3. If neither, look for "Client Portal" (Pain: Manual onboarding) or "Careers" (Pain: Resume filtering).
+    4. Do NOT use generic phrases like "Operational inefficiency". Be specific.
+    5. Return exactly one profile per lead and copy its id verbatim.
+
+    OUTPUT FORMAT (JSON):
+    {
+        "profiles": [
+            {
+                "id": "<lead id>",
+                "is_qualified_business": true/false,
+                "reason_for_disqualification": "only if false",
+                "company_name": "Name",
+                "core_business": "1 sentence description",
+                "operational_pain_points": [
+                    "PRIMARY SPECIFIC PAIN POINT (Based on signals above)",
+                    "Secondary pain point"
+                ],
+                "krykos_automation_hypothesis": "1 sentence pitching the solution to the PRIMARY pain point."
+            }
+        ]
+    }
+    """
+
 class SDRScout:
     def __init__(self):
-        self.firecrawl = FirecrawlApp(api_key=os.getenv("FIRECRAWL_API_KEY"))
-        self.ai = OpenAI(
+        self.firecrawl = FirecrawlApp(api_key=os.getenv("FIRECRAWL_API_KEY"), api_url=os.getenv("FIRECRAWL_API_URL", "https://api.firecrawl.dev"))
+        self.llm = LLMClient(
             api_key=os.getenv("OLLAMA_API_KEY"), 
-            base_url=os.getenv("OLLAMA_BASE_URL")
+            base_url=os.getenv("OLLAMA_BASE_URL"),
+            model=os.getenv("OLLAMA_MODEL"),
+            backend="ollama"
         )
-        self.model = os.getenv("OLLAMA_MODEL")
+        self.scrape_cache = DiskCache(SCRAPE_CACHE_FILE, ttl=SCRAPE_CACHE_TTL, max_bytes=SCRAPE_CACHE_MAX_BYTES)
 
     def _extract_socials(self, markdown):
-        if not markdown: return {"x_from_site": "", "li_from_site": ""}
-        x_match = re.search(r'https?://(?:www\.)?(?:twitter\.com|x\.com)/[a-zA-Z0-9_]+', markdown, re.IGNORECASE)
-        li_match = re.search(r'https?://(?:www\.)?linkedin\.com/(?:company|in)/[a-zA-Z0-9_-]+', markdown, re.IGNORECASE)
-        return {
-            "x_from_site": x_match.group(0) if x_match else "",
-            "li_from_site": li_match.group(0) if li_match else ""
-        }
+        return textproc.extract_socials(markdown)
 
     def _detect_technical_signals(self, markdown):
         """
         Hard-coded logic to find specific triggers for Email Templates.
         """
-        signals = []
-        md_lower = markdown.lower()
-        
-        # Trigger for Template 1 (Manual Data Entry)
-        if "contact us" in md_lower or "send message" in md_lower or "get in touch" in md_lower:
-            signals.append("Has Generic Contact Form (Risk: Manual CRM Entry)")
-            
-        # Trigger for Template 2 (Speed/Scheduling)
-        # If they ask to book but don't have a link like calendly/hubspot
-        if ("book a call" in md_lower or "schedule" in md_lower) and not ("calendly" in md_lower or "hubspot" in md_lower):
-            signals.append("Manual Scheduling Friction (No Auto-Booking detected)")
-            
-        # Trigger for Template 3 (Hiring/Scaling)
-        if "careers" in md_lower or "we are hiring" in md_lower or "join the team" in md_lower:
-            signals.append("Active Hiring (Growing Pains)")
-            
-        return signals
+        return textproc.detect_signals((markdown or "").lower())
 
-    def scrape_website(self, url: str) -> dict:
+    def _scrape_page(self, url: str, force_refresh: bool = False) -> dict:
+        """
+        Fetches one page through the scrape cache. Returns {"markdown", "socials", "final_url"},
+        final_url being where Firecrawl ended up after redirects.
+        Firecrawl is only called on a miss, an expired entry or a forced refresh.
+        """
+        key = content_key("scrape", normalize_url(url))
+        if not force_refresh:
+            cached = self.scrape_cache.get(key)
+            if cached is not None:
+                print(f"[*] Scout: Cache hit for {url}")
+                return cached
+
+        scrape_result = limited("firecrawl", self.firecrawl.scrape, url)
+        if isinstance(scrape_result, dict):
+            markdown = scrape_result.get('markdown', "")
+            final_url = (scrape_result.get('metadata') or {}).get('url')
+        else:
+            markdown = scrape_result.markdown
+            final_url = getattr(scrape_result.metadata, 'url', None) if scrape_result.metadata else None
+        page = {"markdown": markdown or "", "socials": self._extract_socials(markdown), "final_url": final_url or url}
+        # Empty pages are usually transient failures, don't pin them
+        if page["markdown"]:
+            self.scrape_cache.set(key, page)
+        return page
+
+    @metrics.timed("scrape")
+    def scrape_website(self, url: str, force_refresh: bool = False) -> dict:
         print(f"[*] Intelligence Gathering: Accessing {url}...")
         try:
-            scrape_result = self.firecrawl.scrape(url)
-            main_content = scrape_result.get('markdown', "") if isinstance(scrape_result, dict) else scrape_result.markdown
+            main_page = self._scrape_page(url, force_refresh)
+            main_content = main_page["markdown"]
             
             # Find About/Team links
-            about_link = None
-            links = re.findall(r'\[([^\]]*?(?:About|Team|Leadership|Who we are|Staff)[^\]]*?)\]\((.*?)\)', main_content, re.IGNORECASE)
-            if links:
-                potential_path = links[0][1]
-                if potential_path.startswith('/'):
-                    base_url = "/".join(url.split('/')[:3])
-                    about_link = base_url + potential_path
-                elif potential_path.startswith('http'):
-                    about_link = potential_path
+            about_link = textproc.find_about_link(main_content, url)
 
             about_content = ""
+            about_socials = {}
             if about_link:
                 print(f"[*] Scout: Found leadership page at {about_link}. Scraping...")
-                about_scrape = self.firecrawl.scrape(about_link)
-                about_content = about_scrape.get('markdown', "") if isinstance(about_scrape, dict) else about_scrape.markdown
+                about_page = self._scrape_page(about_link, force_refresh)
+                about_content = about_page["markdown"]
+                about_socials = about_page["socials"]
+
+            # Homepage links win, the About page fills the gaps
+            socials = {
+                key: main_page["socials"].get(key) or about_socials.get(key, "")
+                for key in ("x_from_site", "li_from_site")
+            }
 
-            combined_content = (main_content or "") + "\n" + (about_content or "")
-            socials = self._extract_socials(combined_content)
+            # Signals and the condensed views for the LLM stages (big pages go to the process pool)
+            analysis = textproc.analyze(main_content, about_content, GATEKEEPER_TOKEN_BUDGET, HUNTER_TOKEN_BUDGET)
 
             return {
+                "final_url": main_page.get("final_url") or url,
                 "main_md": main_content,
                 "about_md": about_content,
-                "found_socials": socials
+                "found_socials": socials,
+                **analysis
             }
         except Exception as e:
             print(f"[!] Scraping failed: {e}")
+            metrics.fail(e)
             return {"main_md": "", "about_md": "", "found_socials": {"x_from_site": "", "li_from_site": ""}}
 
-    def analyze_business_model(self, markdown_content: str, fallback_name: str) -> str:
+    def analyze_business_model(self, markdown_content: str, fallback_name: str, use_cache: bool = True, stats=None, signals=None) -> str:
+        """`signals` can be passed in when they were detected on the full page before condensing."""
         print(f"[*] Analysis Engine: Detecting specific friction points...")
         
         # 1. Run Technical Signal Detector
-        signals = self._detect_technical_signals(markdown_content)
+        if signals is None:
+            signals = self._detect_technical_signals(markdown_content)
         signals_str = ", ".join(signals) if signals else "No obvious technical triggers found."
         
         # 2. Refined Prompt
@@ -117,12 +177,84 @@ class SDRScout:
         
         try:
             content = markdown_content[:5000] if markdown_content else "No content"
-            response = self.ai.chat.completions.create(
-                model=self.model,
+            return self.llm.complete(
                 messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": content}],
                 response_format={'type': 'json_object'},
-                temperature=0.2 # Low temp = strict adherence to signals
+                temperature=0.2, # Low temp = strict adherence to signals
+                use_cache=use_cache,
+                stats=stats,
+                validate=lambda raw: self._valid_profile(json.loads(raw))
             )
-            return response.choices[0].message.content
         except Exception as e:
-            return json.dumps({"is_qualified_business": False, "company_name": fallback_name})
\ No newline at end of file
+            metrics.fail(e)
+            return json.dumps({"is_qualified_business": False, "company_name": fallback_name})
+
+    def _valid_profile(self, profile):
+        return (
+            isinstance(profile, dict)
+            and isinstance(profile.get("is_qualified_business"), bool)
+            and bool(profile.get("company_name"))
+        )
+
+    def _checked_profile(self, raw, fallback_name):
+        """A single-call answer as held to the batch's standard; anything unusable rejects just that lead."""
+        try:
+            if self._valid_profile(json.loads(raw)):
+                return raw
+        except (TypeError, ValueError):
+            pass
+        print(f"[!] Gatekeeper: unusable profile for {fallback_name}, rejecting it")
+        return json.dumps({"is_qualified_business": False, "company_name": fallback_name,
+                           "reason_for_disqualification": "Unusable Gatekeeper answer"})
+
+    @metrics.timed("gatekeeper")
+    def analyze_business_models(self, items, use_cache: bool = True, stats=None) -> dict:
+        """
+        Batch version of analyze_business_model. `items` is a list of
+        (key, markdown_content, fallback_name[, signals]); returns {key: profile JSON string}.
+        Every lead the model skipped or answered badly is re-run on its own.
+        """
+        items = [tuple(item) + (None,) * (4 - len(item)) for item in items]
+        if len(items) == 1:
+            key, markdown_content, fallback_name, signals = items[0]
+            return {key: self._checked_profile(
+                self.analyze_business_model(markdown_content, fallback_name, use_cache, stats, signals), fallback_name
+            )}
+
+        print(f"[*] Analysis Engine: Qualifying {len(items)} sites in one batch...")
+        ids = {str(i): item[0] for i, item in enumerate(items)}
+        blocks = []
+        for i, (_, markdown_content, _, signals) in enumerate(items):
+            if signals is None:
+                signals = self._detect_technical_signals(markdown_content or "")
+            signals_str = ", ".join(signals) if signals else "No obvious technical triggers found."
+            content = markdown_content[:BATCH_CONTENT_CHARS] if markdown_content else "No content"
+            blocks.append(f"### LEAD {i}\nTECHNICAL SIGNALS: {signals_str}\nCONTENT:\n{content}")
+
+        results = {}
+        try:
+            raw = self.llm.complete(
+                messages=[{"role": "system", "content": BATCH_SYSTEM_PROMPT}, {"role": "user", "content": "\n\n".join(blocks)}],
+                response_format={'type': 'json_object'},
+                temperature=0.2,
+                use_cache=use_cache,
+                stats=stats,
+                validate=lambda raw: isinstance(json.loads(raw).get("profiles"), list)
+            )
+            for profile in json.loads(raw).get("profiles", []):
+                lead_id = str(profile.get("id")) if isinstance(profile, dict) else None
+                if lead_id in ids and ids[lead_id] not in results and self._valid_profile(profile):
+                    profile.pop("id")
+                    results[ids[lead_id]] = json.dumps(profile)
+        except Exception as e:
+            print(f"[!] Gatekeeper batch failed: {e}")
+            metrics.fail(e)
+
+        missing = [item for item in items if item[0] not in results]
+        if missing:
+            print(f"[!] Gatekeeper batch: {len(missing)}/{len(items)} leads fell back to single calls")
+        for key, markdown_content, fallback_name, signals in missing:
+            results[key] = self._checked_profile(
+                self.analyze_business_model(markdown_content, fallback_name, use_cache, stats, signals), fallback_name
+            )
+        return results
@@ -0,0 +1,21 @@
+import os
+
+import httpx
+from duckduckgo_search import DDGS
+
+from ratelimit import limited
+
+# JSON search endpoint used instead of DuckDuckGo when set (e.g. the bench.py fakes)
+SEARCH_API_URL = os.getenv("SEARCH_API_URL")
+
+
+def web_search(query, max_results=10, region='us-en', backend='html'):
+    """DuckDuckGo text search under the process-wide DDGS rate limit."""
+    def run():
+        if SEARCH_API_URL:
+            response = httpx.get(SEARCH_API_URL, params={"q": query, "max_results": max_results}, timeout=30)
+            response.raise_for_status()
+            return response.json()
+        with DDGS() as ddgs:
+            return list(ddgs.text(query, region=region, backend=backend, max_results=max_results) or [])
+    return limited("ddgs", run)
@@ -1,15 +1,17 @@
 import asyncio
+import contextlib
 import json
-import os
-from fastapi import FastAPI, WebSocket
+from datetime import datetime
+from typing import Optional
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
-from discoverer import LeadDiscoverer
-from scout import SDRScout
-from identity import IdentityHunter
-from writer import EmailDrafter
-from database import HistoryDB 
+from database import ResultsStore
+from events import EventCoalescer
+from jobs import JobManager
+import metrics
+import ratelimit
 
 app = FastAPI()
 
@@ -17,146 +19,154 @@ app.add_middleware(
     CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"],
 )
 
-RESULTS_FILE = "campaign_results.json"
+results_store = ResultsStore()
+
+HISTORY_PAGE_LIMIT = 200
+
+def _parse_time(value):
+    """Accepts a unix timestamp or an ISO date/datetime."""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
 
 # --- NEW: ENDPOINT TO LOAD HISTORY ON STARTUP ---
 @app.get("/api/history")
-async def get_history():
-    if os.path.exists(RESULTS_FILE):
-        try:
-            with open(RESULTS_FILE, "r") as f:
-                data = json.load(f)
-                return JSONResponse(content=data)
-        except Exception as e:
-            return JSONResponse(content=[], status_code=500)
-    return JSONResponse(content=[])
-
-# --- EXISTING WEBSOCKET LOGIC ---
+async def get_history(
+    cursor: Optional[int] = None,
+    limit: int = 50,
+    company: Optional[str] = None,
+    domain: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    has_person: Optional[bool] = None,
+    has_linkedin: Optional[bool] = None,
+    view: str = "summary",
+    format: str = "json",
+):
+    try:
+        filters = {
+            "company": company,
+            "domain": domain,
+            "since": _parse_time(since),
+            "until": _parse_time(until),
+            "has_person": has_person,
+            "has_linkedin": has_linkedin,
+            "view": "full" if view == "full" else "summary",
+        }
+    except ValueError as e:
+        return JSONResponse(content={"error": f"Bad date: {e}"}, status_code=400)
+
+    # Export mode: stream every matching record as one JSON object per line
+    if format == "ndjson":
+        rows = (json.dumps(item) + "\n" for item in results_store.iter_query(**filters))
+        return StreamingResponse(rows, media_type="application/x-ndjson")
+
+    try:
+        limit = max(1, min(limit, HISTORY_PAGE_LIMIT))
+        items, next_cursor = await asyncio.to_thread(results_store.query, cursor=cursor, limit=limit, **filters)
+        return JSONResponse(content={"items": items, "next_cursor": next_cursor})
+    except Exception as e:
+        return JSONResponse(content={"items": [], "next_cursor": None}, status_code=500)
+
+@app.get("/api/history/{result_id}")
+async def get_history_item(result_id: int):
+    item = await asyncio.to_thread(results_store.get, result_id)
+    if item is None:
+        return JSONResponse(content={"error": "Not found"}, status_code=404)
+    return JSONResponse(content=item)
+
+# --- CAMPAIGN JOBS ---
+# Campaigns run server-side; websockets only attach to them
+jobs = JobManager(results_store)
+
+@app.on_event("startup")
+async def resume_campaigns():
+    jobs.resume_all()
+
+@app.on_event("shutdown")
+async def stop_campaigns():
+    # Unfinished campaigns stay 'running' in the database and resume on the next start
+    await jobs.shutdown()
+
+@app.get("/api/pipeline")
+async def get_pipeline_stats():
+    return JSONResponse(content=jobs.pipeline_stats())
+
+@app.get("/api/campaigns")
+async def get_campaigns(limit: int = 20):
+    campaigns = await asyncio.to_thread(jobs.store.recent, max(1, min(limit, 100)))
+    return JSONResponse(content=[
+        {**{k: v for k, v in c.items() if k != "config"}, "queue_position": jobs.scheduler.position(c["id"])}
+        for c in campaigns
+    ])
+
+@app.get("/api/scheduler")
+async def get_scheduler_stats():
+    """Running and waiting campaigns, and how each stage's slots are split between them."""
+    return JSONResponse(content=jobs.scheduler.stats())
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Stage latency histograms, LLM tokens/cost, cache hit rates and error counts for Prometheus."""
+    return PlainTextResponse(metrics.registry().render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/ratelimits")
+async def get_rate_limits():
+    """Current wait, backoff and throttle counts per backend bucket."""
+    return JSONResponse(content=ratelimit.all_stats())
+
+# --- WEBSOCKET ---
+# Send a campaign config to start a campaign, or {"attach": "<campaign id>"} to
+# follow one that is already running. Closing the socket doesn't stop the campaign.
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
-    
-    discoverer = LeadDiscoverer()
-    scout = SDRScout()
-    hunter = IdentityHunter()
-    drafter = EmailDrafter()
-    db = HistoryDB()
 
-    try:
-        data = await websocket.receive_text()
-        config = json.loads(data)
-        niche = config.get("niche")
-        target_count = int(config.get("count", 1))
-        
-        await websocket.send_json({"type": "node_active", "node": "1"})
-        await websocket.send_json({"type": "log", "message": f"Scanning for {target_count} targets in: {niche}..."})
-        
-        leads = discoverer.find_companies(niche, count=target_count)
-        
-        if not leads:
-            await websocket.send_json({"type": "error", "message": "No leads found."})
-            return
-
-        await websocket.send_json({"type": "node_done", "node": "1"})
-        
-        qualified_found = 0
-
-        # Load existing results so we can append to them and save
-        existing_results = []
-        if os.path.exists(RESULTS_FILE):
-            try:
-                with open(RESULTS_FILE, "r") as f:
-                    existing_results = json.load(f)
-            except: pass
-
-        for lead in leads:
-            if qualified_found >= target_count:
-                break
-
-            if db.exists(lead['url']):
-                await websocket.send_json({"type": "log", "message": f"Skipping {lead['url']} (In History)"})
-                continue
-
-            await websocket.send_json({"type": "log", "message": f"Processing: {lead['url']}"})
-            
-            # --- SCOUT ---
-            await websocket.send_json({"type": "node_active", "node": "2"})
-            site_data = scout.scrape_website(lead['url'])
-            
-            db.add(lead['url']) # Mark as processed
-            
-            if not site_data["main_md"]:
-                await websocket.send_json({"type": "node_done", "node": "2"})
-                continue
-
-            # --- GATEKEEPER ---
-            await websocket.send_json({"type": "node_done", "node": "2"})
-            await websocket.send_json({"type": "node_active", "node": "3"})
-            
-            analysis_raw = scout.analyze_business_model(site_data["main_md"], lead['name'])
-            profile = json.loads(analysis_raw)
-            
-            if not profile.get("is_qualified_business", True):
-                await websocket.send_json({"type": "log", "message": f"❌ Rejected: {profile.get('company_name')}"})
-                await websocket.send_json({"type": "node_error", "node": "3"})
-                await asyncio.sleep(0.5) 
-                continue
-            
-            qualified_found += 1 
-
-            # --- HUNTER ---
-            await websocket.send_json({"type": "node_done", "node": "3"})
-            await websocket.send_json({"type": "node_active", "node": "4"})
-            
-            combined_text = site_data["main_md"] + "\n" + site_data["about_md"]
-            decision_maker = hunter.find_decision_maker(
-                profile['company_name'], 
-                combined_text, 
-                site_data['found_socials']
-            )
-
-            # --- WRITER ---
-            await websocket.send_json({"type": "node_done", "node": "4"})
-            await websocket.send_json({"type": "node_active", "node": "5"})
-            
-            email_json = drafter.draft_email(
-                profile['company_name'],
-                decision_maker.get('full_name'),
-                profile.get('krykos_automation_hypothesis'),
-                ", ".join(profile.get('operational_pain_points', []))
-            )
-            try:
-                email_data = json.loads(email_json)
-            except:
-                email_data = {"subject": "Error", "body": email_json}
-
-            await websocket.send_json({"type": "node_done", "node": "5"})
-            
-            # FORMAT RESULT
-            result_payload = {
-                "company": profile['company_name'],
-                "person": decision_maker.get('full_name'),
-                "website": lead['url'],
-                "email_subject": email_data.get('subject'),
-                "email_body": email_data.get('body'),
-                "x_url": decision_maker.get('x_url'),
-                "linkedin_url": decision_maker.get('linkedin_url'),
-                "pain_points": profile.get('operational_pain_points', []),
-                "hypothesis": profile.get('krykos_automation_hypothesis')
-            }
-            
-            # --- SAVE TO FILE IMMEDIATELY ---
-            existing_results.append(result_payload)
-            with open(RESULTS_FILE, "w") as f:
-                json.dump(existing_results, f, indent=2)
-
-            # SEND TO UI
-            await websocket.send_json({"type": "result", "data": result_payload})
-            
-            await asyncio.sleep(1)
-
-        await websocket.send_json({"type": "log", "message": "🏁 Mission Complete."})
+    send_lock = asyncio.Lock()
+
+    async def emit(payload):
+        async with send_lock:
+            await websocket.send_json(payload)
 
+    # Campaign events reach the client in batches, not one frame each
+    events = EventCoalescer(emit)
+
+    job = None
+    try:
+        config = json.loads(await websocket.receive_text())
+        if config.get("attach"):
+            job = jobs.get(config["attach"])
+            if job is None:
+                campaign = await asyncio.to_thread(jobs.store.get, config["attach"])
+                status = campaign["status"] if campaign else "unknown"
+                await emit({"type": "error", "message": f"Campaign is not running ({status})."})
+                return
+        else:
+            job = jobs.start(config)
+
+        await emit({"type": "campaign", "id": job.id})
+        await job.attach(events.add)
+
+        # Stay until the campaign ends or the client leaves; client messages are ignored
+        async def wait_disconnect():
+            while True:
+                await websocket.receive_text()
+
+        listener = asyncio.create_task(wait_disconnect())
+        try:
+            await asyncio.wait({listener, job.task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            listener.cancel()
+    except WebSocketDisconnect:
+        pass
     except Exception as e:
         print(f"Error: {e}")
-        await websocket.send_json({"type": "error", "message": str(e)})
\ No newline at end of file
+        await events.add({"type": "error", "message": str(e)})
+    finally:
+        if job:
+            job.detach(events.add)
+        with contextlib.suppress(Exception):
+            await events.close()
@@ -0,0 +1,120 @@
+"""
+Per-page text analysis for the Scout: link and social extraction, signal
+detection and condensation. Everything here is a pure function of the page
+text, so big pages can be analyzed in a process pool instead of holding the
+GIL against the event loop and its websockets.
+"""
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from condense import condense_sections, join_sections, split_sections
+
+# Pages (main + About, in chars) at least this big are analyzed in the process pool
+TEXTPROC_POOL_MIN_CHARS = int(os.getenv("TEXTPROC_POOL_MIN_CHARS", "60000"))
+# 0 analyzes everything inline
+TEXTPROC_WORKERS = int(os.getenv("TEXTPROC_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+X_PROFILE = re.compile(r'https?://(?:www\.)?(?:twitter\.com|x\.com)/[a-zA-Z0-9_]+', re.IGNORECASE)
+LINKEDIN_PROFILE = re.compile(r'https?://(?:www\.)?linkedin\.com/(?:company|in)/[a-zA-Z0-9_-]+', re.IGNORECASE)
+ABOUT_LINK = re.compile(r'\[([^\]]*?(?:About|Team|Leadership|Who we are|Staff)[^\]]*?)\]\((.*?)\)', re.IGNORECASE)
+
+# (signal, phrases that trigger it, phrases that cancel it), checked on the lowercased page
+SIGNALS = [
+    # Template 1 (Manual Data Entry)
+    ("Has Generic Contact Form (Risk: Manual CRM Entry)", ("contact us", "send message", "get in touch"), ()),
+    # Template 2 (Speed/Scheduling): they ask to book but have no calendly/hubspot link
+    ("Manual Scheduling Friction (No Auto-Booking detected)", ("book a call", "schedule"), ("calendly", "hubspot")),
+    # Template 3 (Hiring/Scaling)
+    ("Active Hiring (Growing Pains)", ("careers", "we are hiring", "join the team"), ()),
+]
+
+
+def extract_socials(markdown):
+    """First X and LinkedIn profile URLs on the page."""
+    if not markdown:
+        return {"x_from_site": "", "li_from_site": ""}
+    x_match = X_PROFILE.search(markdown)
+    li_match = LINKEDIN_PROFILE.search(markdown)
+    return {
+        "x_from_site": x_match.group(0) if x_match else "",
+        "li_from_site": li_match.group(0) if li_match else ""
+    }
+
+
+def detect_signals(md_lower):
+    """Hard-coded triggers for the email templates. Takes the already lowercased page."""
+    return [
+        signal for signal, phrases, blockers in SIGNALS
+        if any(p in md_lower for p in phrases) and not any(b in md_lower for b in blockers)
+    ]
+
+
+def find_about_link(markdown, url):
+    """Absolute URL of the first About/Team/Leadership link, or None."""
+    match = ABOUT_LINK.search(markdown or "")
+    if not match:
+        return None
+    path = match.group(2)
+    if path.startswith('/'):
+        return "/".join(url.split('/')[:3]) + path
+    if path.startswith('http'):
+        return path
+    return None
+
+
+def analyze_page(main_md, about_md, gatekeeper_budget, hunter_budget):
+    """
+    Signals and the condensed views for the LLM stages: business model from
+    the homepage, leadership from homepage + About page. Each page is split
+    and cleaned once and shared by both budgets.
+    """
+    main_md, about_md = main_md or "", about_md or ""
+    main_sections = split_sections(main_md)
+    business_md, business_stats = condense_sections(main_sections, len(main_md), gatekeeper_budget, focus="business")
+    leadership_md, leadership_stats = condense_sections(
+        join_sections(main_sections, split_sections(about_md)), len(main_md) + 1 + len(about_md),
+        hunter_budget, focus="leadership"
+    )
+    return {
+        "signals": detect_signals(main_md.lower()),
+        "business_md": business_md,
+        "leadership_md": leadership_md,
+        "compression": {"gatekeeper": business_stats, "hunter": leadership_stats},
+    }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def process_pool():
+    """The process-wide pool for big pages (spawned, so workers don't inherit threads or sockets)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=TEXTPROC_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def analyze(main_md, about_md, gatekeeper_budget, hunter_budget):
+    """analyze_page(), in the process pool for big pages. Blocks the calling (worker) thread, not the loop."""
+    size = len(main_md or "") + len(about_md or "")
+    if TEXTPROC_WORKERS > 0 and size >= TEXTPROC_POOL_MIN_CHARS:
+        try:
+            return process_pool().submit(analyze_page, main_md, about_md, gatekeeper_budget, hunter_budget).result()
+        except BrokenProcessPool as e:
+            print(f"[!] Text processing pool died ({e}), analyzing inline")
+            shutdown()
+    return analyze_page(main_md, about_md, gatekeeper_budget, hunter_budget)
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
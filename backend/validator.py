@@ -0,0 +1,99 @@
+import asyncio
+import os
+from urllib.parse import urlparse
+
+import httpx
+
+from cache import DiskCache, content_key, normalize_url
+
+VALIDATION_CACHE_FILE = os.getenv("VALIDATION_CACHE_FILE", "validation_cache.db")
+VALIDATION_TTL = float(os.getenv("VALIDATION_TTL_HOURS", "72")) * 3600
+VALIDATION_PER_HOST = int(os.getenv("VALIDATION_PER_HOST", "2"))
+
+# We use a real User-Agent to avoid being blocked by X during a ping
+HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'}
+# Hosts that answer 200 for missing profiles, so the body has to be checked
+BODY_CHECK_HOSTS = ('x.com', 'twitter.com')
+DEAD_MARKERS = ("account doesn't exist", "account doesn’t exist")
+# Enough of the page to see the "account doesn't exist" banner
+BODY_BYTES = 16 * 1024
+
+
+class SocialURLValidator:
+    """
+    Checks that social profile URLs are alive over one pooled HTTP client.
+    Uses HEAD where the status code is enough and a ranged GET where the body
+    matters. Verdicts are cached with a TTL and each host gets a small
+    concurrency limit so we don't get blocked.
+    """
+    def __init__(self, client=None, ttl=VALIDATION_TTL, per_host=VALIDATION_PER_HOST, timeout=5.0, cache=None,
+                 body_check_hosts=BODY_CHECK_HOSTS):
+        self.client = client
+        self.body_check_hosts = body_check_hosts
+        self.timeout = timeout
+        self.per_host = per_host
+        self.cache = cache or DiskCache(VALIDATION_CACHE_FILE, ttl=ttl, max_bytes=20 * 1024 * 1024)
+        self.host_slots = {}
+
+    def _client(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                headers=HEADERS,
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+            )
+        return self.client
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def validate(self, url):
+        """Returns the url if it is alive (or we can't tell), '' if it is dead."""
+        if not url or "http" not in url:
+            return ""
+        key = content_key("social", normalize_url(url))
+        # SQLite can wait on its lock; keep that off the event loop
+        verdict = await asyncio.to_thread(self.cache.get, key)
+        if verdict is None:
+            verdict = await self._check(url)
+            # Only definite answers are remembered, a timeout may be a one-off
+            if verdict != "unknown":
+                await asyncio.to_thread(self.cache.set, key, verdict)
+        return "" if verdict == "dead" else url
+
+    async def validate_many(self, urls):
+        """Validates several URLs in parallel, preserving order."""
+        return list(await asyncio.gather(*(self.validate(url) for url in urls)))
+
+    async def _check(self, url):
+        host = (urlparse(url).hostname or "").lower()
+        slots = self.host_slots.setdefault(host, asyncio.Semaphore(self.per_host))
+        needs_body = any(host == h or host.endswith("." + h) for h in self.body_check_hosts)
+        async with slots:
+            try:
+                client = self._client()
+                if not needs_body:
+                    response = await client.head(url)
+                    if response.status_code in (404, 410):
+                        return "dead"
+                    if response.status_code < 400:
+                        return "alive"
+                    # Some hosts reject HEAD (405) or bots (LinkedIn's 999): try a small GET
+
+                async with client.stream("GET", url, headers={"Range": f"bytes=0-{BODY_BYTES - 1}"}) as response:
+                    if response.status_code in (404, 410):
+                        return "dead"
+                    if response.status_code >= 400:
+                        return "unknown"
+                    body = b""
+                    async for chunk in response.aiter_bytes():
+                        body += chunk
+                        if len(body) >= BODY_BYTES:
+                            break
+                text = body.decode("utf-8", errors="ignore").lower()
+                return "dead" if any(m in text for m in DEAD_MARKERS) else "alive"
+            except Exception:
+                return "unknown" # Fallback if request fails but we aren't sure
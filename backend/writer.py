@@ -1,18 +1,86 @@
 import os
+import re
 import json
-from openai import OpenAI
 from dotenv import load_dotenv
 
+from llm import LLMClient
+import metrics
+
 load_dotenv()
 
+# Stream the DeepSeek completion so subject/body show up in the UI as they are written
+WRITER_STREAM = os.getenv("WRITER_STREAM", "1") != "0"
+DRAFT_FIELDS = ("subject", "body")
+
+
+class DraftStream:
+    """
+    Follows the raw JSON text as it streams in and reports what was added to
+    the subject and body strings since the last chunk, already unescaped.
+    """
+    def __init__(self, on_field_delta):
+        self.on_field_delta = on_field_delta
+        self.text = ""
+        self.sent = {field: 0 for field in DRAFT_FIELDS}
+
+    def feed(self, chunk):
+        self.text += chunk
+        for field in DRAFT_FIELDS:
+            value = self._partial(field)
+            if value is not None and len(value) > self.sent[field]:
+                self.on_field_delta(field, value[self.sent[field]:])
+                self.sent[field] = len(value)
+
+    def _partial(self, field):
+        """The field's string value so far, or None if it hasn't started."""
+        start = re.search(r'"%s"\s*:\s*"' % field, self.text)
+        if not start:
+            return None
+        raw = self.text[start.end():]
+        end = re.search(r'(?<!\\)(?:\\\\)*"', raw)
+        if end:
+            raw = raw[:end.end() - 1]
+        else:
+            # Don't decode half an escape sequence (\ or \u12..)
+            if (len(raw) - len(raw.rstrip("\\"))) % 2:
+                raw = raw[:-1]
+            else:
+                raw = re.sub(r'(?<!\\)((?:\\\\)*)\\u[0-9a-fA-F]{0,3}$', r'\1', raw)
+        try:
+            return json.loads(f'"{raw}"')
+        except ValueError:
+            return None
+
+
+def parse_draft(email_json):
+    """The {"subject", "body"} dict if the completion is a usable draft, else None."""
+    try:
+        data = json.loads(email_json)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(data, dict) or not all(isinstance(data.get(f), str) and data.get(f).strip() for f in DRAFT_FIELDS):
+        return None
+    return data
+
+
 class EmailDrafter:
     def __init__(self):
-        self.ai = OpenAI(
+        self.llm = LLMClient(
             api_key=os.getenv("DEEPSEEK_API_KEY"), 
-            base_url="https://api.deepseek.com"
+            base_url=os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com"),
+            model="deepseek-chat",
+            backend="deepseek"
         )
 
-    def draft_email(self, company_name, decision_maker, hypothesis, pain_points):
+    @metrics.timed("writer")
+    def draft_email(self, company_name, decision_maker, hypothesis, pain_points, use_cache=True, stats=None,
+                    on_delta=None):
+        """
+        Returns the draft as a JSON string. With `on_delta(field, text)` the
+        completion is streamed and every addition to the subject or body is
+        reported as it arrives; `on_delta(None, None)` means throw the partial
+        draft away (the stream produced something unusable and we retried).
+        """
         print(f"[*] Drafter: Crafting high-converting copy for {company_name}...")
         
         name = decision_maker if decision_maker and decision_maker != "Unknown" else "there"
@@ -95,13 +163,26 @@ class EmailDrafter:
         }}
         """
         
+        request = dict(
+            messages=[{"role": "user", "content": prompt}],
+            response_format={'type': 'json_object'},
+            temperature=0.6, # Increased slightly to allow Subject Line variety
+            stats=stats,
+            validate=parse_draft
+        )
+
+        if on_delta and WRITER_STREAM:
+            try:
+                email_json = self.llm.complete(use_cache=use_cache, on_delta=DraftStream(on_delta).feed, **request)
+                if parse_draft(email_json):
+                    return email_json
+                print(f"[!] Drafter: Streamed draft for {company_name} is not valid JSON, retrying without streaming")
+            except Exception as e:
+                print(f"[!] Drafter: Stream failed for {company_name} ({e}), retrying without streaming")
+            on_delta(None, None)
+
         try:
-            response = self.ai.chat.completions.create(
-                model="deepseek-chat",
-                messages=[{"role": "user", "content": prompt}],
-                response_format={'type': 'json_object'},
-                temperature=0.6 # Increased slightly to allow Subject Line variety
-            )
-            return response.choices[0].message.content
+            return self.llm.complete(use_cache=use_cache, **request)
         except Exception as e:
+            metrics.fail(e)
             return json.dumps({"subject": "Error", "body": str(e)})
\ No newline at end of file
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import ReactFlow, { Background, Controls, useNodesState, useEdgesState } from 'reactflow';
 import 'reactflow/dist/style.css';
 import { Play, Terminal, Mail, User, CheckCircle } from 'lucide-react';
@@ -19,6 +19,12 @@ const initialEdges = [
   { id: 'e4-5', source: '4', target: '5', animated: false },
 ];
 
+// Which graph node a "metric" span belongs to
+const STAGE_NODES = { discover: '1', scrape: '2', gatekeeper: '3', hunter_name: '4', hunter_search: '4', hunter_links: '4', writer: '5' };
+
+// Lead status for each node event
+const NODE_STATUS = { node_active: 'active', node_done: 'done', node_error: 'error' };
+
 export default function App() {
   const [nodes, setNodes] = useNodesState(initialNodes);
   const [edges, setEdges] = useEdgesState(initialEdges);
@@ -29,101 +35,250 @@ export default function App() {
   const [results, setResults] = useState([]); 
   const [selectedLead, setSelectedLead] = useState(null); 
   const [isRunning, setIsRunning] = useState(false);
+  const [forceRefresh, setForceRefresh] = useState(false);
+  const [queuePosition, setQueuePosition] = useState(0);
+  const [stageTimes, setStageTimes] = useState({});
+  // Drafts the Writer is still streaming, by lead url: { subject, body }
+  const [drafts, setDrafts] = useState({});
+  // Where each lead is, by url: { node, status } (status: active | done | error)
+  const [leadStages, setLeadStages] = useState({});
+  // Node events that belong to no lead (Discovery)
+  const [graphStatus, setGraphStatus] = useState({});
 
-  // --- FETCH HISTORY ON LOAD ---
-  useEffect(() => {
-    fetch('http://localhost:8000/api/history')
+  const [nextCursor, setNextCursor] = useState(null);
+  const [companyFilter, setCompanyFilter] = useState('');
+
+  // The newest history request; a newer one aborts it so it can't overwrite the list
+  const historyRequest = useRef(null);
+
+  // --- FETCH HISTORY (one page of lightweight summaries, newest first) ---
+  const loadHistory = (cursor = null, company = companyFilter) => {
+    const params = new URLSearchParams({ view: 'summary', limit: '50' });
+    if (cursor) params.set('cursor', cursor);
+    if (company) params.set('company', company);
+
+    if (historyRequest.current) historyRequest.current.abort();
+    const controller = new AbortController();
+    historyRequest.current = controller;
+
+    fetch(`http://localhost:8000/api/history?${params}`, { signal: controller.signal })
       .then(res => res.json())
       .then(data => {
-        if (data && data.length > 0) {
-          setResults(data);
-          // Optional: Auto-select the most recent one
-          setSelectedLead(data[data.length - 1]);
-        }
+        if (historyRequest.current !== controller) return;
+        setResults((prev) => cursor ? [...prev, ...data.items] : data.items);
+        setNextCursor(data.next_cursor);
       })
-      .catch(err => console.error("Could not load history", err));
-  }, []);
+      .catch(err => {
+        if (err.name !== 'AbortError') console.error("Could not load history", err);
+      });
+  };
+
+  // First page on load, then once the company filter stops changing
+  useEffect(() => {
+    const timer = setTimeout(() => loadHistory(null, companyFilter), companyFilter ? 300 : 0);
+    return () => clearTimeout(timer);
+  }, [companyFilter]);
+
+  // The graph is derived from where the leads are: a node glows while leads
+  // are in it and turns green once one has made it through
+  useEffect(() => {
+    const order = initialNodes.map((n) => n.id);
+    const active = {};
+    let furthest = -1;
+    Object.values(leadStages).forEach(({ node, status }) => {
+      if (status === 'active') {
+        active[node] = (active[node] || 0) + 1;
+      }
+      const reached = order.indexOf(node) - (status === 'done' ? 0 : 1);
+      furthest = Math.max(furthest, reached);
+    });
 
-  // Helper to reset graph colors
-  // If keepDiscovery is true, Node 1 stays green. Otherwise, all reset to gray.
-  const resetGraph = (keepDiscovery = false) => {
     setNodes((nds) => nds.map((n) => {
-      // Keep Discovery green if we are starting a new lead in the loop
-      if (keepDiscovery && n.id === '1') {
-          return n; 
+      const base = initialNodes.find((i) => i.id === n.id).data.label;
+      const t = stageTimes[n.id];
+      const label = `${base}${active[n.id] > 1 ? ` ×${active[n.id]}` : ''}${t ? ` · ${(t.total / t.count).toFixed(1)}s` : ''}`;
+      const passed = n.id === '1' ? graphStatus['1'] === 'done' : order.indexOf(n.id) <= furthest;
+      const glowing = active[n.id] || graphStatus[n.id] === 'active';
+      let style = { ...n.style, background: '#1e1e1e', color: '#fff', borderColor: '#555', boxShadow: 'none' };
+      if (passed) {
+        style = { ...style, background: '#00FF94', color: '#000', borderColor: '#00FF94' };
+      }
+      if (glowing) {
+        style = { ...style, borderColor: '#00FF94', boxShadow: '0 0 15px #00FF94' };
       }
-      return { 
-          ...n, 
-          style: { ...n.style, background: '#1e1e1e', color: '#fff', borderColor: '#555', boxShadow: 'none' } 
-      };
+      return { ...n, data: { ...n.data, label }, style };
     }));
-    
-    setEdges((eds) => eds.map((e) => ({ ...e, animated: false, style: { stroke: '#555' } })));
-  };
+    // Animate the edges into busy nodes
+    setEdges((eds) => eds.map((e) => (
+      active[e.target] ? { ...e, animated: true, style: { stroke: '#00FF94' } } : { ...e, animated: false, style: { stroke: '#555' } }
+    )));
+  }, [leadStages, graphStatus, stageTimes]);
 
-  const startMission = () => {
-    setIsRunning(true);
-    setLogs((prev) => [...prev, "🚀 Initializing connection..."]);
-    
-    // FULL RESET when starting a brand new mission
-    resetGraph(false); 
+  // The list only holds summaries; the full draft is fetched when a lead is opened
+  const openLead = (lead) => {
+    if (lead.email_body !== undefined) {
+      setSelectedLead(lead);
+      return;
+    }
+    fetch(`http://localhost:8000/api/history/${lead.id}`)
+      .then(res => res.json())
+      .then(setSelectedLead)
+      .catch(err => console.error("Could not load lead", err));
+  };
 
+  // Campaigns run on the server; the socket only follows one. `firstMessage` is
+  // either a new campaign config or {attach: id} to pick a running one back up.
+  const connect = (firstMessage) => {
     const ws = new WebSocket('ws://localhost:8000/ws');
 
     ws.onopen = () => {
-      ws.send(JSON.stringify({ niche, count }));
+      ws.send(JSON.stringify(firstMessage));
     };
 
+    // The server batches events; each frame is applied with one update per piece of state
     ws.onmessage = (event) => {
-      const msg = JSON.parse(event.data);
+      applyFrame(JSON.parse(event.data));
+    };
+  };
+
+  // Runs the queued updaters for one piece of state as a single setState
+  const applyAll = (setter, updates) => {
+    if (updates.length) {
+      setter((prev) => updates.reduce((state, update) => update(state), prev));
+    }
+  };
+
+  // A "batch" frame ({events, leads, nodes}) or a single event
+  const applyFrame = (frame) => {
+    const events = frame.type === 'batch' ? frame.events : [frame];
+    const leads = { ...frame.leads };
+    const graph = { ...frame.nodes };
+    const lines = [];
+    const times = [];
+    const draftUpdates = [];
+    const resultUpdates = [];
+    const selectUpdates = [];
+    let queue = null;
+    let finished = false;
+
+    events.forEach((msg) => {
+      if (msg.type === 'campaign') {
+        localStorage.setItem('campaign_id', msg.id);
+      }
+
+      // Other campaigns are using the backends; 0 means ours is running
+      if (msg.type === 'queue') {
+        queue = msg.position;
+      }
 
       if (msg.type === 'log') {
-        setLogs((prev) => [...prev, `> ${msg.message}`]);
-        
-        // PARTIAL RESET when moving to the next lead (Keeps Discovery green)
-        if (msg.message.startsWith("Processing:")) {
-            resetGraph(true); 
-        }
+        lines.push(`> ${msg.message}`);
+      }
+
+      // Running average per node, shown under its label
+      if (msg.type === 'metric' && STAGE_NODES[msg.stage]) {
+        times.push([STAGE_NODES[msg.stage], msg.seconds]);
+      }
+
+      if (msg.type === 'lead_stages') {
+        Object.assign(leads, msg.leads);
       }
 
-      if (msg.type === 'node_active') {
-        setNodes((nds) =>
-          nds.map((n) => {
-            if (n.id === msg.node) {
-              return { ...n, style: { ...n.style, borderColor: '#00FF94', boxShadow: '0 0 15px #00FF94' } };
-            }
-            return n;
-          })
-        );
-        // Animate edge
-        setEdges((eds) => eds.map(e => e.target === msg.node ? { ...e, animated: true, style: { stroke: '#00FF94' } } : e));
+      if (NODE_STATUS[msg.type]) {
+        if (msg.lead) {
+          leads[msg.lead] = { node: msg.node, status: NODE_STATUS[msg.type] };
+        } else {
+          graph[msg.node] = NODE_STATUS[msg.type];
+        }
       }
 
-      if (msg.type === 'node_done') {
-        setNodes((nds) =>
-          nds.map((n) => {
-            if (n.id === msg.node) {
-              return { ...n, style: { ...n.style, background: '#00FF94', color: '#000', borderColor: '#00FF94' } };
-            }
-            return n;
-          })
-        );
+      // Subject/body text as the Writer generates it; `reset` drops a failed attempt
+      if (msg.type === 'draft_delta') {
+        draftUpdates.push((prev) => {
+          const draft = prev[msg.lead] || { subject: '', body: '' };
+          if (msg.reset) {
+            return { ...prev, [msg.lead]: { subject: '', body: '' } };
+          }
+          return { ...prev, [msg.lead]: { ...draft, [msg.field]: draft[msg.field] + msg.delta } };
+        });
+        selectUpdates.push((prev) => prev || { website: msg.lead, drafting: true });
       }
 
       if (msg.type === 'result') {
-        setResults((prev) => {
-            const newResults = [...prev, msg.data];
-            setSelectedLead(msg.data); 
-            return newResults;
+        // A reattached socket replays results the history list may already have
+        resultUpdates.push((prev) => [msg.data, ...prev.filter((r) => r.id !== msg.data.id)]);
+        draftUpdates.push((prev) => {
+          const rest = { ...prev };
+          delete rest[msg.data.website];
+          return rest;
         });
+        // Don't pull the operator away from another draft they are watching
+        selectUpdates.push((prev) => prev && prev.drafting && prev.website !== msg.data.website ? prev : msg.data);
       }
 
       if (msg.type === 'error' || msg.message === "🏁 Mission Complete.") {
-          setIsRunning(false);
+        finished = true;
       }
-    };
+    });
+
+    if (lines.length) {
+      setLogs((prev) => [...prev, ...lines]);
+    }
+    if (times.length) {
+      setStageTimes((prev) => {
+        const next = { ...prev };
+        times.forEach(([node, seconds]) => {
+          const entry = next[node] || { total: 0, count: 0 };
+          next[node] = { total: entry.total + seconds, count: entry.count + 1 };
+        });
+        return next;
+      });
+    }
+    if (Object.keys(leads).length) {
+      setLeadStages((prev) => ({ ...prev, ...leads }));
+    }
+    if (Object.keys(graph).length) {
+      setGraphStatus((prev) => ({ ...prev, ...graph }));
+    }
+    applyAll(setDrafts, draftUpdates);
+    applyAll(setResults, resultUpdates);
+    applyAll(setSelectedLead, selectUpdates);
+    if (queue !== null) {
+      setQueuePosition(queue);
+    }
+    if (finished) {
+      setIsRunning(false);
+      setQueuePosition(0);
+      localStorage.removeItem('campaign_id');
+    }
+  };
+
+  const startMission = () => {
+    setIsRunning(true);
+    setLogs((prev) => [...prev, "🚀 Initializing connection..."]);
+    
+    // FULL RESET when starting a brand new mission
+    setLeadStages({});
+    setGraphStatus({});
+    setStageTimes({});
+    setDrafts({});
+    connect({ niche, count, force_refresh: forceRefresh, metrics: true });
   };
 
+  // Reopened tab: follow the campaign that was running when it closed
+  useEffect(() => {
+    const campaignId = localStorage.getItem('campaign_id');
+    if (campaignId) {
+      setIsRunning(true);
+      setLogs((prev) => [...prev, "🔌 Reattaching to running campaign..."]);
+      connect({ attach: campaignId });
+    }
+  }, []);
+
+  // A lead still being drafted shows the streamed text so far
+  const draft = selectedLead && selectedLead.drafting ? drafts[selectedLead.website] : null;
+  const preview = draft ? { ...selectedLead, email_subject: draft.subject, email_body: draft.body } : selectedLead;
+
   return (
     <div style={{ width: '100vw', height: '100vh', background: '#000', color: 'white', display: 'flex', flexDirection: 'column', fontFamily: 'Inter, sans-serif' }}>
       
@@ -147,12 +302,17 @@ export default function App() {
             />
         </div>
 
+        <label style={{display:'flex', alignItems:'center', gap:'5px', fontSize:'12px', color:'#888'}}>
+            <input type="checkbox" checked={forceRefresh} onChange={(e) => setForceRefresh(e.target.checked)} />
+            Fresh scrape
+        </label>
+
         <button 
           onClick={startMission} 
           disabled={isRunning}
           style={{ background: '#00FF94', border: 'none', padding: '8px 20px', borderRadius: '5px', fontWeight: 'bold', cursor: 'pointer', display: 'flex', alignItems: 'center', gap: '5px', marginLeft: 'auto' }}
         >
-          <Play size={16} /> {isRunning ? 'Running...' : 'Launch Agent'}
+          <Play size={16} /> {isRunning ? (queuePosition > 0 ? `Queued (#${queuePosition})` : 'Running...') : 'Launch Agent'}
         </button>
       </div>
 
@@ -174,17 +334,39 @@ export default function App() {
 
         {/* INBOX LIST */}
         <div style={{ width: '300px', borderRight: '1px solid #333', overflowY: 'auto', background:'#080808' }}>
-            <h4 style={{ padding: '15px', margin: 0, borderBottom:'1px solid #333', display:'flex', alignItems:'center', gap:'8px', fontSize: '14px' }}><Mail size={16}/> Drafts ({results.length})</h4>
+            <h4 style={{ padding: '15px', margin: 0, borderBottom:'1px solid #333', display:'flex', alignItems:'center', gap:'8px', fontSize: '14px' }}><Mail size={16}/> Drafts ({results.length}{nextCursor ? '+' : ''})</h4>
+            <input
+                value={companyFilter}
+                onChange={(e) => setCompanyFilter(e.target.value)}
+                placeholder="Filter by company"
+                style={{ background: '#111', border: 'none', borderBottom: '1px solid #333', color: 'white', padding: '10px 15px', width: '100%', boxSizing: 'border-box' }}
+            />
+            {Object.keys(drafts).map((url) => (
+                <div
+                    key={url}
+                    onClick={() => setSelectedLead({ website: url, drafting: true })}
+                    style={{
+                        padding: '15px',
+                        borderBottom: '1px solid #222',
+                        cursor: 'pointer',
+                        background: selectedLead && selectedLead.drafting && selectedLead.website === url ? '#1A1A1A' : 'transparent',
+                        borderLeft: '3px solid #555'
+                    }}
+                >
+                    <div style={{fontWeight:'bold', fontSize:'13px', color: '#aaa'}}>{drafts[url].subject || url}</div>
+                    <div style={{fontSize:'12px', color:'#666', marginTop: '4px'}}>✍️ Drafting...</div>
+                </div>
+            ))}
             {results.map((lead, i) => (
                 <div 
-                    key={i}
-                    onClick={() => setSelectedLead(lead)}
+                    key={lead.id || i}
+                    onClick={() => openLead(lead)}
                     style={{
                         padding: '15px', 
                         borderBottom: '1px solid #222', 
                         cursor: 'pointer', 
-                        background: selectedLead === lead ? '#1A1A1A' : 'transparent',
-                        borderLeft: selectedLead === lead ? '3px solid #00FF94' : '3px solid transparent',
+                        background: selectedLead && selectedLead.id === lead.id ? '#1A1A1A' : 'transparent',
+                        borderLeft: selectedLead && selectedLead.id === lead.id ? '3px solid #00FF94' : '3px solid transparent',
                         transition: 'background 0.2s'
                     }}
                 >
@@ -192,22 +374,30 @@ export default function App() {
                     <div style={{fontSize:'12px', color:'#666', marginTop: '4px'}}>{lead.person || 'Unknown Person'}</div>
                 </div>
             ))}
+            {nextCursor && (
+                <button
+                    onClick={() => loadHistory(nextCursor)}
+                    style={{ width: '100%', padding: '12px', background: 'transparent', border: 'none', color: '#00FF94', cursor: 'pointer', fontSize: '12px' }}
+                >
+                    Load more
+                </button>
+            )}
         </div>
 
         {/* EMAIL PREVIEW (Maximized) */}
         <div style={{ flex: 1, padding: '40px', background:'#111', overflowY:'auto' }}>
-          {selectedLead ? (
+          {preview ? (
             <div style={{ maxWidth: '800px', margin:'0 auto', background: '#fff', color: '#000', borderRadius: '8px', boxShadow: '0 4px 30px rgba(0,0,0,0.5)', overflow: 'hidden' }}>
                 
                 {/* Header */}
                 <div style={{ padding: '30px', borderBottom: '1px solid #eee', background: '#f9f9f9' }}>
-                    <h1 style={{fontSize:'20px', fontWeight:'bold', margin: '0 0 15px 0', color: '#222'}}>{selectedLead.email_subject}</h1>
+                    <h1 style={{fontSize:'20px', fontWeight:'bold', margin: '0 0 15px 0', color: '#222'}}>{preview.email_subject}</h1>
                     <div style={{display:'flex', alignItems:'center', gap:'12px'}}>
                         <div style={{width:'36px', height:'36px', borderRadius:'50%', background:'#444', color: '#fff', display:'flex', alignItems:'center', justifyContent:'center', fontWeight: 'bold'}}>
-                            {selectedLead.person && selectedLead.person !== 'Unknown' ? selectedLead.person[0] : 'U'}
+                            {preview.person && preview.person !== 'Unknown' ? preview.person[0] : 'U'}
                         </div>
                         <div>
-                            <div style={{fontSize:'13px', fontWeight:'bold'}}>To: {selectedLead.person}</div>
+                            <div style={{fontSize:'13px', fontWeight:'bold'}}>To: {preview.person}</div>
                             <div style={{fontSize:'12px', color:'#666'}}>Analysis by Krykos Scout</div>
                         </div>
                     </div>
@@ -215,25 +405,25 @@ export default function App() {
                 
                 {/* Body */}
                 <div style={{ padding: '40px', fontSize: '15px', lineHeight: '1.6', color: '#333', fontFamily: 'Arial, sans-serif' }}>
-                    {selectedLead.email_body ? selectedLead.email_body.split('\n').map((line, i) => (
+                    {preview.email_body ? preview.email_body.split('\n').map((line, i) => (
                         <div key={i} style={{ minHeight: '1em' }}>{line}</div>
-                    )) : "No draft available."}
+                    )) : (preview.drafting ? "Drafting..." : "No draft available.")}
                 </div>
 
                 {/* Footer Actions */}
                 <div style={{ padding: '20px 30px', background: '#f5f5f5', borderTop: '1px solid #eee', display: 'flex', gap: '15px' }}>
-                    {selectedLead.website && (
-                        <a href={selectedLead.website} target="_blank" rel="noreferrer" style={{fontSize:'13px', color:'#333', textDecoration:'none', fontWeight: 'bold'}}>
+                    {preview.website && (
+                        <a href={preview.website} target="_blank" rel="noreferrer" style={{fontSize:'13px', color:'#333', textDecoration:'none', fontWeight: 'bold'}}>
                             Visit Website ↗
                         </a>
                     )}
-                    {selectedLead.x_url && (
-                        <a href={selectedLead.x_url} target="_blank" rel="noreferrer" style={{fontSize:'13px', color:'#1DA1F2', textDecoration:'none', fontWeight: 'bold'}}>
+                    {preview.x_url && (
+                        <a href={preview.x_url} target="_blank" rel="noreferrer" style={{fontSize:'13px', color:'#1DA1F2', textDecoration:'none', fontWeight: 'bold'}}>
                             Open X Profile ↗
                         </a>
                     )}
-                    {selectedLead.linkedin_url && (
-                        <a href={selectedLead.linkedin_url} target="_blank" rel="noreferrer" style={{fontSize:'13px', color:'#0077b5', textDecoration:'none', fontWeight: 'bold'}}>
+                    {preview.linkedin_url && (
+                        <a href={preview.linkedin_url} target="_blank" rel="noreferrer" style={{fontSize:'13px', color:'#0077b5', textDecoration:'none', fontWeight: 'bold'}}>
                             Open LinkedIn ↗
                         </a>
                     )}